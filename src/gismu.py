@@ -1,97 +1,181 @@
 from gismutables import *
+from gismuscore import parseAlignment
 from collections import defaultdict
 
 ##
-# Description of a gismu.
+# Attributes common to all gismu.
 #
-class Gismu(object):
-    def __init__(self, gismu, definition, comment, xrefs, rafsi, keywords):
+class BaseGismu(object):
+    __slots__ = ('gismu', 'definition', 'comment', 'xrefs')
+
+    def __init__(self, gismu, definition, comment, xrefs):
         self.gismu = gismu
         self.definition = definition
         self.comment = comment
         self.xrefs = xrefs
+
+    def addSourceword(self, sourceword):
+        self.sourcewords.append(sourceword)
+
+##
+# Description of a gismu.
+#
+# The keywords map each place to a tuple of its keywords.
+#
+class Gismu(BaseGismu):
+    __slots__ = ('rafsi', 'keywords', 'sourcewords')
+
+    def __init__(self, gismu, definition, comment, xrefs, rafsi, keywords):
+        super(Gismu, self).__init__(gismu, definition, comment, xrefs)
         self.rafsi = rafsi
         self.keywords = keywords
         self.sourcewords = []
 
-    def addSourceword(self, sourceword):
-        self.sourcewords.append(sourceword)
+##
+# Description of a gismu whose rafsi, keywords and source words are
+# loaded on first access.
+#
+# Each of them is loaded through the factory with a query of its own,
+# unless the factory prefetched it for a group of gismu.  Assigning any
+# of them replaces what would be loaded.
+#
+class LazyGismu(BaseGismu):
+    __slots__ = ('factory', '_rafsi', '_keywords', '_sourcewords')
+
+    def __init__(self, factory, gismu, definition, comment, xrefs):
+        super(LazyGismu, self).__init__(gismu, definition, comment, xrefs)
+        self.factory = factory
+        self._rafsi = None
+        self._keywords = None
+        self._sourcewords = None
+
+    @property
+    def rafsi(self):
+        if self._rafsi is None:
+            self._rafsi = self.factory.loadRafsi(self.gismu)
+        return self._rafsi
+
+    @rafsi.setter
+    def rafsi(self, rafsi):
+        self._rafsi = rafsi
+
+    @property
+    def keywords(self):
+        if self._keywords is None:
+            self._keywords = self.factory.loadKeywords(self.gismu)
+        return self._keywords
+
+    @keywords.setter
+    def keywords(self, keywords):
+        self._keywords = keywords
+
+    @property
+    def sourcewords(self):
+        if self._sourcewords is None:
+            self._sourcewords = self.factory.loadSourcewords(self.gismu)
+        return self._sourcewords
+
+    @sourcewords.setter
+    def sourcewords(self, sourcewords):
+        self._sourcewords = sourcewords
 
 ##
 # Description of a source word.
 #
+# Source words are held in slots, and the language is an attribute of
+# the class, so that many of them can be kept in memory at once.  The
+# attributes named in blank do not apply to the language and are None.
+#
 class Sourceword(object):
+    __slots__ = ('sourceword', 'transliteration', 'translation', 'klass',
+                 'transcription', 'score', 'comment', 'alternative',
+                 'alignment')
+
+    langcode = None
+    language = None
+    blank = ()
+
     def __init__(self, row):
-        self.langcode = row['langcode']
-        self.language = row['language']
         self.sourceword = row.get('sourceword')
         self.transliteration = row.get('transliteration')
         self.translation = row.get('translation')
         self.klass = row.get('klass')
         self.transcription = row.get('transcription')
-        self.score = int(row.get('score'))
+        self.score = row.get('score')
         self.comment = row.get('comment')
         self.alternative = row.get('alternative')
+        self.alignment = parseAlignment(row.get('alignment') or '')
+
+        for name in self.blank:
+            setattr(self, name, None)
 
 ##
 # Description of a Chinese source word.
 #
 class ChineseSourceword(Sourceword):
-    def __init__(self, row):
-        row['klass'] = None
-        row.setdefault('langcode', 'zh')
-        row.setdefault('language', 'Chinese')
-        super(ChineseSourceword, self).__init__(row)
+    __slots__ = ()
+    langcode = 'zh'
+    language = 'Chinese'
+    blank = ('klass',)
 
 ##
 # Description of a Hindi source word.
 #
 class HindiSourceword(Sourceword):
-    def __init__(self, row):
-        row['alternative'] = None
-        row.setdefault('langcode', 'hi')
-        row.setdefault('language', 'Hindi')
-        super(HindiSourceword, self).__init__(row)
+    __slots__ = ()
+    langcode = 'hi'
+    language = 'Hindi'
+    blank = ('alternative',)
 
 ##
 # Description of an Arabic source word.
 #
 class ArabicSourceword(HindiSourceword):
-    def __init__(self, row):
-        row['klass'] = None
-        row.setdefault('langcode', 'ar')
-        row.setdefault('language', 'Arabic')
-        super(ArabicSourceword, self).__init__(row)
+    __slots__ = ()
+    langcode = 'ar'
+    language = 'Arabic'
+    blank = ('klass', 'alternative')
 
 ##
 # Description of a Russian source word.
 #
 class RussianSourceword(ArabicSourceword):
-    def __init__(self, row):
-        row['klass'] = None
-        row.setdefault('langcode', 'ru')
-        row.setdefault('language', 'Russian')
-        super(ArabicSourceword, self).__init__(row)
+    __slots__ = ()
+    langcode = 'ru'
+    language = 'Russian'
 
 ##
 # Description of a Spanish source word.
 #
 class SpanishSourceword(RussianSourceword):
-    def __init__(self, row):
-        row['transliteration'] = None
-        row.setdefault('langcode', 'es')
-        row.setdefault('language', 'Spanish')
-        super(SpanishSourceword, self).__init__(row)
+    __slots__ = ()
+    langcode = 'es'
+    language = 'Spanish'
+    blank = ('transliteration', 'klass', 'alternative')
 
 ##
 # Description of an English source word.
 #
 class EnglishSourceword(SpanishSourceword):
+    __slots__ = ()
+    langcode = 'en'
+    language = 'English'
+
     def __init__(self, row):
-        row['translation'] = row['sourceword']
-        row.setdefault('langcode', 'en')
-        row.setdefault('language', 'English')
         super(EnglishSourceword, self).__init__(row)
+        self.translation = self.sourceword
+
+##
+# Source word classes by language id.
+#
+sourcewordClasses = dict(
+    (id, dict(zh=ChineseSourceword,
+              hi=HindiSourceword,
+              ar=ArabicSourceword,
+              ru=RussianSourceword,
+              es=SpanishSourceword,
+              en=EnglishSourceword)[langcode])
+    for id, langcode, language in languages)
 
 ##
 # Factory of gismu descriptions.
@@ -101,81 +185,258 @@ class GismuFactory(object):
         self.definitions = DefinitionTable(connection)
         self.rafsi = RafsiTable(connection)
         self.keywords = KeywordTable(connection)
-        self.chinese = ChineseTable(connection)
-        self.arabic = ArabicTable(connection)
-        self.english = EnglishTable(connection)
-        self.hindi = HindiTable(connection)
-        self.spanish = SpanishTable(connection)
-        self.russian = RussianTable(connection)
+        self.sourcewords = SourcewordTable(connection)
 
     def _openTables(self):
         self.definitions.open()
         self.rafsi.open()
         self.keywords.open()
-        self.chinese.open()
-        self.arabic.open()
-        self.english.open()
-        self.hindi.open()
-        self.spanish.open()
-        self.russian.open()
+        self.sourcewords.open()
 
     def _closeTables(self):
         self.definitions.close()
         self.rafsi.close()
         self.keywords.close()
-        self.chinese.close()
-        self.arabic.close()
-        self.english.close()
-        self.hindi.close()
-        self.spanish.close()
-        self.russian.close()
+        self.sourcewords.close()
 
+    ##
+    # Return the gismu whose definitions match the conditions in where.
+    #
+    # The gismu are listed in order of the gismu, unless ordered by the
+    # special argument order, and limited by limit, as in Table.select.
+    #
     def gismu(self, **where):
-        self._openTables()
-        result = set(row['gismu'] for row in self.definitions.select('gismu', **where))
-        self._closeTables()
+        where.setdefault('order', 'gismu')
+
+        self.definitions.open()
+        result = [row['gismu']
+                  for row in self.definitions.select('gismu', **where)]
+        self.definitions.close()
 
         return result
 
-    def create(self, gismu):
+    ##
+    # Return the query plans of every query the factory issues, each
+    # with its SQL.
+    #
+    # Queries selecting a single gismu select the given one.  Groups
+    # are read from whole tables by createAll, and for lists of gismu
+    # by createMany, createLazyMany and prefetch.
+    #
+    def queryPlans(self, gismu):
         self._openTables()
 
-        definition = self.definitions.select(gismu=gismu).next()
+        plans = [self.definitions.queryPlan('gismu', order='gismu'),
+                 self.definitions.queryPlan(gismu=gismu),
+                 self.definitions.queryPlan('gismu',
+                                            gismu=Prefix(gismu[:2]),
+                                            order='gismu',
+                                            limit=10),
+                 self.rafsi.queryPlan('rafsi', gismu=gismu),
+                 self.keywords.queryPlan('place', 'keyword', gismu=gismu),
+                 self.sourcewords.queryPlan(gismu=gismu)]
+
+        for table in [self.definitions, self.rafsi, self.keywords,
+                      self.sourcewords]:
+            plans.append(table.queryPlan(*table.attributes,
+                                         order=['gismu', 'rowid']))
+            plans.append(table.queryPlan(*table.attributes,
+                                         gismu=In([gismu]),
+                                         order=['gismu', 'rowid']))
+
+        self._closeTables()
+
+        return plans
 
-        rafsi = []
-        for row in self.rafsi.select('rafsi', gismu=gismu):
-            rafsi.append(row['rafsi'])
+    def _rafsi(self, rows):
+        return [row['rafsi'] for row in rows]
 
+    def _keywords(self, rows):
         keywords = defaultdict(set)
-        for row in self.keywords.select('place', 'keyword', gismu=gismu):
-            keywords[int(row['place'])].add(row['keyword'])
+        for row in rows:
+            keywords[row['place']].add(row['keyword'])
+        return dict((place, tuple(words))
+                    for place, words in keywords.iteritems())
 
+    ##
+    # Return the source words in rows.
+    #
+    # Source words are ordered by language, in the order of the
+    # language ids, and in the order of their rows within each language.
+    #
+    def _sourcewords(self, rows):
+        result = []
+        for row in sorted(rows, key=lambda row: row['language']):
+            row = dict(row)
+            sourcewordclass = sourcewordClasses[row.pop('language')]
+            result.append(sourcewordclass(row))
+        return result
 
+    def _build(self, gismu, definition, rafsirows, keywordrows,
+               sourcewordrows):
         obj = Gismu(gismu,
                     definition['definition'],
                     definition['comments'],
                     definition['xrefs'],
-                    rafsi,
-                    keywords)
+                    self._rafsi(rafsirows),
+                    self._keywords(keywordrows))
+
+        for sourceword in self._sourcewords(sourcewordrows):
+            obj.addSourceword(sourceword)
+
+        return obj
+
+    def create(self, gismu):
+        self._openTables()
+
+        obj = self._build(
+            gismu,
+            self.definitions.select(gismu=gismu).next(),
+            self.rafsi.select('rafsi', gismu=gismu),
+            self.keywords.select('place', 'keyword', gismu=gismu),
+            self.sourcewords.select(gismu=gismu))
+
+        self._closeTables()
+
+        return obj
 
-        for row in self.chinese.select(gismu=gismu):
-            obj.addSourceword(ChineseSourceword(row))
+    def createAll(self):
+        return self.createMany(None)
 
-        for row in self.hindi.select(gismu=gismu):
-            obj.addSourceword(HindiSourceword(row))
+    ##
+    # Create the gismu in a list, or all gismu if the list is None.
+    #
+    # Every table is read once, grouped by gismu in sorted order, and
+    # the groups are merged along the definitions.  The result maps
+    # each gismu to its description.
+    #
+    def createMany(self, gismus):
+        self._openTables()
 
-        for row in self.arabic.select(gismu=gismu):
-            obj.addSourceword(ArabicSourceword(row))
+        streams = [self.rafsi.groups('gismu', ['gismu', 'rafsi'], gismus),
+                   self.keywords.groups('gismu', ['gismu', 'place', 'keyword'],
+                                        gismus),
+                   self.sourcewords.groups('gismu',
+                                           self.sourcewords.attributes,
+                                           gismus)]
 
-        for row in self.russian.select(gismu=gismu):
-            obj.addSourceword(RussianSourceword(row))
+        heads = [next(stream, None) for stream in streams]
 
-        for row in self.spanish.select(gismu=gismu):
-            obj.addSourceword(SpanishSourceword(row))
+        result = {}
+        for gismu, definitions in self.definitions.groups(
+                'gismu', self.definitions.attributes, gismus):
+            groups = []
+            for i, stream in enumerate(streams):
+                while heads[i] is not None and heads[i][0] < gismu:
+                    heads[i] = next(stream, None)
+                if heads[i] is not None and heads[i][0] == gismu:
+                    groups.append(heads[i][1])
+                    heads[i] = next(stream, None)
+                else:
+                    groups.append([])
 
-        for row in self.english.select(gismu=gismu):
-            obj.addSourceword(EnglishSourceword(row))
+            result[gismu] = self._build(gismu, definitions[0],
+                                        groups[0], groups[1], groups[2])
 
         self._closeTables()
 
-        return obj
+        return result
+
+    def loadRafsi(self, gismu):
+        self.rafsi.open()
+        result = self._rafsi(self.rafsi.select('rafsi', gismu=gismu))
+        self.rafsi.close()
+        return result
+
+    def loadKeywords(self, gismu):
+        self.keywords.open()
+        result = self._keywords(
+            self.keywords.select('place', 'keyword', gismu=gismu))
+        self.keywords.close()
+        return result
+
+    def loadSourcewords(self, gismu):
+        self.sourcewords.open()
+        result = self._sourcewords(self.sourcewords.select(gismu=gismu))
+        self.sourcewords.close()
+        return result
+
+    ##
+    # Create a gismu whose other data is loaded on first access.
+    #
+    def createLazy(self, gismu):
+        return self.createLazyMany([gismu])[gismu]
+
+    ##
+    # Create the gismu in a list, or all gismu if the list is None,
+    # loading only their definitions.
+    #
+    # The data named in prefetch is loaded at once for all of them,
+    # with one query per table.
+    #
+    def createLazyMany(self, gismus, prefetch=()):
+        self.definitions.open()
+
+        result = {}
+        for gismu, rows in self.definitions.groups(
+            'gismu', self.definitions.attributes, gismus):
+            result[gismu] = LazyGismu(self,
+                                      gismu,
+                                      rows[0]['definition'],
+                                      rows[0]['comments'],
+                                      rows[0]['xrefs'])
+
+        self.definitions.close()
+
+        self.prefetch(result.values(), *prefetch)
+
+        return result
+
+    ##
+    # Load rafsi, keywords or source words for a list of lazy gismu.
+    #
+    # Each of attributes is one of 'rafsi', 'keywords' and
+    # 'sourcewords'.  Gismu that already loaded it are left alone.
+    #
+    def prefetch(self, objs, *attributes):
+        for attribute in attributes:
+            table = getattr(self, attribute)
+            convert = getattr(self, '_' + attribute)
+
+            pending = dict((obj.gismu, obj) for obj in objs
+                           if getattr(obj, '_' + attribute) is None)
+            if not pending:
+                continue
+
+            table.open()
+
+            rows = dict(table.groups('gismu', table.attributes, pending))
+            for gismu, obj in pending.iteritems():
+                setattr(obj, '_' + attribute, convert(rows.get(gismu, [])))
+
+            table.close()
+
+##
+# Print the query plans of the factory queries.
+#
+def main(filename):
+    import sqlite3
+
+    factory = GismuFactory(sqlite3.connect(filename))
+    gismu = min(factory.gismu())
+
+    for sql, plan in factory.queryPlans(gismu):
+        print sql
+        for line in plan:
+            print '  %s' % line
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) >= 2:
+        main(sys.argv[1])
+    else:
+        main('dictionary.sql')
@@ -0,0 +1,171 @@
+#!/usr/bin/python
+
+from gismuscore import *
+
+import sys
+import os
+import os.path
+import codecs
+import random
+from timeit import default_timer
+from optparse import OptionParser
+
+##
+# Consume a generator.
+#
+def consume(iterable):
+    for x in iterable:
+        pass
+
+##
+# Benchmarked functions, as callables taking a gismu and a word.
+#
+benchmarks = [
+    ('subsequences', lambda gismu, word: consume(subsequences(word))),
+    ('isSubsequence', lambda gismu, word: isSubsequence(gismu, word)),
+    ('commonSubsequences', commonSubsequences),
+    ('longestCommonSubsequence', longestCommonSubsequence),
+    ('bitParallelLCS', bitParallelLCS),
+    ('letterpairs', lambda gismu, word: consume(letterpairs(word))),
+    ('commonLetterpair', commonLetterpair),
+    ('score', score),
+    ('score lcs', lambda gismu, word: score(gismu, word, 'lcs')),
+    ('score legacy', lambda gismu, word: score(gismu, word, 'legacy'))]
+
+##
+# Functions whose cost grows exponentially with the word length.
+#
+exponential = set(['subsequences', 'commonSubsequences', 'score legacy'])
+
+##
+# Return the time per call of function over a list of pairs.
+#
+# The pairs are run repeatedly until at least mintime seconds pass.
+#
+def measure(function, pairs, mintime):
+    calls, elapsed = 0, 0.0
+    while elapsed < mintime:
+        start = default_timer()
+        for gismu, word in pairs:
+            function(gismu, word)
+        elapsed += default_timer() - start
+        calls += len(pairs)
+    return elapsed / calls
+
+##
+# Format a time per call.
+#
+def formatTime(seconds):
+    if seconds is None:
+        return '-'
+    if seconds >= 1:
+        return '%.2f s' % seconds
+    if seconds >= 1e-3:
+        return '%.2f ms' % (seconds * 1e3)
+    return '%.2f us' % (seconds * 1e6)
+
+##
+# Print a table with a header.
+#
+def printTable(header, rows):
+    widths = [max(len(row[i]) for row in [header] + rows)
+              for i in range(len(header))]
+    for row in [header] + rows:
+        print '  '.join(cell.rjust(width)
+                        for cell, width in zip(row, widths))
+    print
+
+##
+# Load (gismu, transcription) pairs from the source word files.
+#
+def loadPairs(directory):
+    pairs = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.startswith('lojban-source-words_'):
+            continue
+
+        language = filename[len('lojban-source-words_'):-len('.txt')]
+        pairs[language] = []
+
+        for line in codecs.open(os.path.join(directory, filename),
+                                'r', 'utf-8'):
+            fields = map(unicode.strip, line.split('\t'))
+            pairs[language].append((fields[0], fields[2]))
+
+    return pairs
+
+##
+# Benchmark all functions on the source word files.
+#
+def benchmarkData(directory, mintime):
+    pairs = loadPairs(directory)
+    languages = sorted(pairs)
+
+    rows = []
+    for name, function in benchmarks:
+        rows.append([name] + [formatTime(measure(function,
+                                                 pairs[language],
+                                                 mintime))
+                              for language in languages])
+
+    print 'Time per call on the source word files'
+    print
+    printTable(['function'] + languages, rows)
+
+##
+# Generate a random word of the given length.
+#
+def randomWord(length, letters='abcdefgijklmnoprstuvxz'):
+    return ''.join(random.choice(letters) for i in xrange(length))
+
+##
+# Benchmark all functions on random words of increasing length.
+#
+# Functions with exponential cost are skipped for words longer than
+# maxexponential.
+#
+def benchmarkScaling(lengths, maxexponential, mintime, samples=16):
+    random.seed(0)
+
+    rows = []
+    for length in lengths:
+        pairs = [(randomWord(5), randomWord(length))
+                 for i in xrange(samples)]
+        row = [str(length)]
+        for name, function in benchmarks:
+            if name in exponential and length > maxexponential:
+                row.append(formatTime(None))
+            else:
+                row.append(formatTime(measure(function, pairs, mintime)))
+        rows.append(row)
+
+    print 'Time per call by word length'
+    print
+    printTable(['length'] + [name for name, function in benchmarks], rows)
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] [directory]')
+    parser.add_option('-l', '--max-length', type='int', default=32,
+                      help='benchmark random words up to LENGTH letters')
+    parser.add_option('-x', '--max-exponential', type='int', default=16,
+                      help='skip exponential functions beyond LENGTH')
+    parser.add_option('-t', '--min-time', type='float', default=0.2,
+                      help='run each benchmark for at least SECONDS')
+    options, args = parser.parse_args()
+
+    if args:
+        directory = args[0]
+    else:
+        directory = os.path.join(
+            os.path.dirname(
+                os.path.dirname(
+                    os.path.realpath(sys.argv[0]))),
+            'data')
+
+    benchmarkData(directory, options.min_time)
+    benchmarkScaling(range(2, options.max_length + 1, 2),
+                     options.max_exponential,
+                     options.min_time)
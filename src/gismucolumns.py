@@ -0,0 +1,302 @@
+#!/usr/bin/python
+
+from gismu import *
+
+import sqlite3
+from array import array
+from bisect import bisect_left
+from timeit import default_timer
+from optparse import OptionParser
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+##
+# Return an array of integers.
+#
+def intArray(values):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.int32)
+    return array('l', values)
+
+##
+# Pool of distinct strings.
+#
+# Each string added is stored once, and referred to by its id.  Once
+# frozen, the strings are kept as a single text with the offset of
+# each string in it.  The id of None is -1.
+#
+class StringPool(object):
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def add(self, string):
+        if string is None:
+            return -1
+        if string not in self.ids:
+            self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return self.ids[string]
+
+    def freeze(self):
+        offsets = [0]
+        for string in self.strings:
+            offsets.append(offsets[-1] + len(string))
+
+        self.text = u''.join(self.strings)
+        self.offsets = array('l', offsets)
+        del self.ids, self.strings
+
+    def get(self, id):
+        if id < 0:
+            return None
+        return self.text[self.offsets[id]:self.offsets[id+1]]
+
+##
+# Source words held in columns.
+#
+# Rows are ordered by gismu, and by rowid within each gismu.  The gismu
+# and language of each row, and its score, are held in parallel integer
+# arrays; every other attribute is an array of ids into a shared string
+# pool.  The first row of each gismu is found through starts.
+#
+# Filters and aggregates work on whole columns, with numpy if it is
+# available.  The store also offers the select and groups methods of
+# the source word table, so it can take the place of that table in a
+# gismu factory.
+#
+class SourcewordColumns(object):
+    attributes = SourcewordTable(None).attributes
+    strings = [name for name in attributes
+               if name not in ('gismu', 'language', 'score')]
+
+    def __init__(self, rows):
+        self.gismus = sorted(set(row['gismu'] for row in rows))
+        index = dict((gismu, i) for i, gismu in enumerate(self.gismus))
+
+        self.pool = StringPool()
+
+        self.gismu = intArray([index[row['gismu']] for row in rows])
+        self.language = intArray([row['language'] for row in rows])
+        self.score = intArray([row['score'] for row in rows])
+        self.columns = dict(
+            (name, intArray([self.pool.add(row[name]) for row in rows]))
+            for name in self.strings)
+
+        self.pool.freeze()
+
+        starts = [0] * (len(self.gismus) + 1)
+        for i in self.gismu:
+            starts[i+1] += 1
+        for i in xrange(len(self.gismus)):
+            starts[i+1] += starts[i]
+        self.starts = array('l', starts)
+
+    @classmethod
+    def fromConnection(cls, connection):
+        table = SourcewordTable(connection)
+        table.open()
+        rows = [row
+                for gismu, group in table.groups('gismu', table.attributes)
+                for row in group]
+        table.close()
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.gismu)
+
+    ##
+    # Return the value of an attribute in a row.
+    #
+    def value(self, i, name):
+        if name == 'gismu':
+            return self.gismus[self.gismu[i]]
+        if name == 'language':
+            return int(self.language[i])
+        if name == 'score':
+            return int(self.score[i])
+        return self.pool.get(self.columns[name][i])
+
+    def row(self, i, attributes=None):
+        return dict((name, self.value(i, name))
+                    for name in attributes or self.attributes)
+
+    ##
+    # Return the rows of the source words matching all criteria.
+    #
+    # The language is given as a language code.  Scores are compared
+    # inclusively.
+    #
+    def filter(self, langcode=None, minscore=None, maxscore=None):
+        language = None
+        if langcode is not None:
+            language = dict((code, id) for id, code, name in languages)[
+                langcode]
+
+        if numpy is not None:
+            mask = numpy.ones(len(self), dtype=bool)
+            if language is not None:
+                mask &= self.language == language
+            if minscore is not None:
+                mask &= self.score >= minscore
+            if maxscore is not None:
+                mask &= self.score <= maxscore
+            return numpy.flatnonzero(mask)
+
+        return [i for i in xrange(len(self))
+                if (language is None or self.language[i] == language) and
+                (minscore is None or self.score[i] >= minscore) and
+                (maxscore is None or self.score[i] <= maxscore)]
+
+    ##
+    # Aggregate the scores of rows by gismu.
+    #
+    # The aggregate is one of count, sum, max and mean.  The result maps
+    # every gismu with rows to its aggregate.
+    #
+    def groupBy(self, rows, aggregate='count'):
+        if numpy is not None:
+            rows = numpy.asarray(rows, dtype=numpy.intp)
+            gismu = self.gismu[rows]
+            score = self.score[rows]
+            size = len(self.gismus)
+
+            counts = numpy.bincount(gismu, minlength=size)
+            if aggregate == 'count':
+                values = counts
+            elif aggregate == 'max':
+                values = numpy.full(size, numpy.iinfo(numpy.int32).min)
+                numpy.maximum.at(values, gismu, score)
+            else:
+                values = numpy.bincount(gismu, weights=score, minlength=size)
+                if aggregate == 'mean':
+                    values = values / numpy.maximum(counts, 1)
+                else:
+                    values = values.astype(int)
+
+            return dict((self.gismus[i], values[i].item())
+                        for i in numpy.flatnonzero(counts))
+
+        counts, values = {}, {}
+        for i in rows:
+            gismu = self.gismus[self.gismu[i]]
+            score = self.score[i]
+            counts[gismu] = counts.get(gismu, 0) + 1
+            if aggregate == 'max':
+                values[gismu] = max(values.get(gismu, score), score)
+            else:
+                values[gismu] = values.get(gismu, 0) + score
+
+        if aggregate == 'count':
+            return counts
+        if aggregate == 'mean':
+            return dict((gismu, values[gismu] / float(counts[gismu]))
+                        for gismu in values)
+        return values
+
+    ##
+    # Return the range of rows of a gismu.
+    #
+    def span(self, gismu):
+        i = bisect_left(self.gismus, gismu)
+        if i == len(self.gismus) or self.gismus[i] != gismu:
+            return xrange(0)
+        return xrange(self.starts[i], self.starts[i+1])
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def select(self, *attributes, **where):
+        if set(where) - set(['gismu']):
+            raise ValueError('can only select by gismu')
+
+        if 'gismu' in where:
+            rows = self.span(where['gismu'])
+        else:
+            rows = xrange(len(self))
+
+        for i in rows:
+            yield self.row(i, attributes)
+
+    def groups(self, key, attributes, keys=None):
+        if key != 'gismu':
+            raise ValueError('can only group by gismu')
+
+        if keys is None:
+            keys = self.gismus
+        else:
+            keys = sorted(set(keys))
+
+        for gismu in keys:
+            rows = self.span(gismu)
+            if rows:
+                yield gismu, [self.row(i, attributes) for i in rows]
+
+##
+# Factory reading the source words from columns.
+#
+class ColumnarFactory(GismuFactory):
+    def __init__(self, connection, columns=None):
+        super(ColumnarFactory, self).__init__(connection)
+        if columns is None:
+            columns = SourcewordColumns.fromConnection(connection)
+        self.sourcewords = columns
+
+##
+# Count the source words of a language with a minimum score, by
+# scanning the gismu and by filtering the columns.
+#
+def main(filename, langcode, minscore):
+    connection = sqlite3.connect(filename)
+
+    start = default_timer()
+    columns = SourcewordColumns.fromConnection(connection)
+    print 'Columns built in %.3f s (%d rows, %d strings)' % (
+        default_timer() - start, len(columns), len(columns.pool.offsets) - 1)
+
+    gismus = GismuFactory(connection).createAll()
+
+    start = default_timer()
+    expected = {}
+    for gismu in gismus.itervalues():
+        for sourceword in gismu.sourcewords:
+            if (sourceword.langcode == langcode and
+                sourceword.score >= minscore):
+                expected[gismu.gismu] = expected.get(gismu.gismu, 0) + 1
+    print 'Objects: %.2f ms' % ((default_timer() - start) * 1e3)
+
+    start = default_timer()
+    actual = columns.groupBy(columns.filter(langcode, minscore))
+    print 'Columns: %.2f ms' % ((default_timer() - start) * 1e3)
+
+    assert actual == expected
+
+    print '%d source words in %d gismu' % (sum(actual.itervalues()),
+                                           len(actual))
+    for gismu, count in sorted(actual.iteritems(),
+                               key=lambda (gismu, count): (-count, gismu))[:5]:
+        print '  %s %d' % (gismu, count)
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] [database]')
+    parser.add_option('-l', '--language', default='en',
+                      help='count source words in LANGUAGE')
+    parser.add_option('-s', '--min-score', type='int', default=3,
+                      help='count source words scoring at least SCORE')
+    options, args = parser.parse_args()
+
+    if args:
+        filename = args[0]
+    else:
+        filename = 'dictionary.sql'
+
+    main(filename, options.language, options.min_score)
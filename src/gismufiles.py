@@ -1,4 +1,6 @@
+import re
 import codecs
+from itertools import izip
 
 ##
 # Process a file line by line.
@@ -37,12 +39,24 @@ class TabFile(File):
 ##
 # Process a file with fixed offsets.
 #
+# The first lines of the file, as given by header, are skipped.
+#
 class OffsetFile(File):
+    header = 0
+
     def __init__(self, filename, offsets):
         super(OffsetFile, self).__init__(filename)
         self.offsets = offsets
 
+    def open(self):
+        super(OffsetFile, self).open()
+        for i, line in izip(xrange(self.header), self.file):
+            pass
+
     def process(self, line):
+        return self.complete(self.split(line))
+
+    def split(self, line):
         fields = {}
 
         for (attribute, (begin, end)) in self.offsets.iteritems():
@@ -51,6 +65,9 @@ class OffsetFile(File):
             else:
                 fields[attribute] = line[begin:end].strip()
 
+        return fields
+
+    def complete(self, fields):
         yield fields
 
 ##
@@ -73,6 +90,8 @@ class ObliqueKeywordsFile(File):
 # Process the gismu file.
 #
 class GismuFile(OffsetFile):
+    header = 1
+
     def __init__(self, filename):
         super(GismuFile, self).__init__(
             filename,
@@ -87,18 +106,9 @@ class GismuFile(OffsetFile):
                  frequency=(161, 169),
                  comment=(169, -1)))
 
-    def open(self):
-        super(GismuFile, self).open()
-        # skip the first line
-        for line in self.file:
-            break
-
-    def process(self, line):
-        for fields in super(GismuFile, self).process(line):
-            # skip cmavo
-            if len(fields['gismu']) != 5:
-                continue
-
+    def complete(self, fields):
+        # skip cmavo
+        if len(fields['gismu']) == 5:
             yield self.parse(fields)
 
     def parse(self, fields):
@@ -125,32 +135,29 @@ class GismuFile(OffsetFile):
         comment = self.fixComment(comment)
 
         parens = []
-        part = ''
         parts = []
 
-        for c in comment:
+        for match in self.brackets.finditer(comment):
+            c, i = match.group(), match.start()
             if c in '([':
+                if not parens:
+                    begin = i + 1
                 parens.append(c)
-                if len(parens) != 1:
-                    part += c
             elif c == ')' and parens and parens[-1] == '(' or \
                  c == ']' and parens and parens[-1] == '[':
                 parens.pop()
-                if parens:
-                    part += c
-                    continue
-                part = part.strip()
-                parts.append(part)
-                part = ''
-            elif parens:
-                part += c
+                if not parens:
+                    parts.append(comment[begin:i].strip())
 
-        part = part.strip()
-        if part:
-            parts.append(part)
+        if parens:
+            part = comment[begin:].strip()
+            if part:
+                parts.append(part)
 
         return parts
 
+    brackets = re.compile(r'[()\[\]]')
+
     def fixComment(self, comment):
         return self.brokenComments.get(comment, comment)
 
@@ -166,6 +173,8 @@ class GismuFile(OffsetFile):
 # Process the cmavo file.
 #
 class CmavoFile(OffsetFile):
+    header = 1
+
     def __init__(self, filename):
         super(CmavoFile, self).__init__(
             filename,
@@ -177,9 +186,3 @@ class CmavoFile(OffsetFile):
         # definition=(62, 112), # or 145, or 146, or 168
         # comment=(112, 146), # or 145, or 168; or from 109 (sepu'a), 110 (tepu'a), 107 (teta'i)
         # picture=(146, 168), # or from 145
-
-    def open(self):
-        super(CmavoFile, self).open()
-        # skip the first line
-        for line in self.file:
-            break
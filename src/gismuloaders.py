@@ -1,33 +1,320 @@
 from gismufiles import *
 from gismutables import *
 
+import os.path
+import hashlib
+import traceback
+import multiprocessing
+from collections import defaultdict
+
+##
+# Version of the loaders.
+#
+# Increment this whenever a change to the files or tables modules
+# changes the rows loaded from a file, so that incremental loads
+# rebuild the database.
+#
+LOADER_VERSION = 4
+
+##
+# Score the source word in a row.
+#
+# This runs in the worker processes of a parallel load.
+#
+def scoreFields(fields):
+    if 'transcription' in fields and 'score' not in fields:
+        fields['score'], fields['alignment'] = scoreTranscription(
+            fields['gismu'], fields['transcription'])
+    return fields
+
+##
+# Parse and score a file into a queue.
+#
+# This runs in a separate process for each file when loading through a
+# pipeline.  Rows are put into the queue in chunks, followed by None.
+# If parsing fails, the traceback is put into the queue instead.
+#
+def produce(file, queue, chunksize):
+    try:
+        file.open()
+        chunk = []
+        for fields in file.load():
+            chunk.append(scoreFields(fields))
+            if len(chunk) == chunksize:
+                queue.put(chunk)
+                chunk = []
+        file.close()
+
+        if chunk:
+            queue.put(chunk)
+        queue.put(None)
+    except Exception:
+        queue.put(traceback.format_exc())
+        raise
+
 ##
 # Load data from a file into one or many tables.
 #
+# If a process pool is set, source words are scored in the pool, in
+# batches of rows read ahead from the file.  If a producer is started,
+# the file is parsed and scored in a process of its own, which streams
+# rows through a bounded queue.  Either way, rows are still inserted
+# in order by this process.
+#
 class Loader(object):
     def __init__(self, file, *tables):
         self.file = file
         self.tables = tables
+        self.cache = None
+        self.pool = None
+        self.fast = False
+        self.producer = None
+        self.parsed = None
+        self.changed = set()
 
     def open(self):
-        self.file.open()
+        if self.producer is None:
+            self.file.open()
         for table in self.tables:
             table.open()
 
     def load(self):
         for table in self.tables:
             table.create()
-            table.commit()
+            if not self.fast:
+                table.commit()
 
-        for fields in self.file.load():
+        for fields in self.rows():
             for table in self.tables:
                 table.insert(fields)
 
         for table in self.tables:
+            table.flush()
+            if not self.fast:
+                table.createIndexes()
+                table.commit()
+
+    def createIndexes(self):
+        for table in self.tables:
+            table.open()
+            table.createIndexes()
+            table.close()
+
+    def rows(self):
+        if self.producer is not None:
+            return self.consume()
+        if self.pool is None or not any(isinstance(table, SourcewordTable)
+                                        for table in self.tables):
+            return self.file.load()
+        return self.scoreRows()
+
+    def startProducer(self, queuesize=16, chunksize=256):
+        self.queue = multiprocessing.Queue(queuesize)
+        self.producer = multiprocessing.Process(
+            target=produce,
+            args=(self.file, self.queue, chunksize))
+        self.producer.start()
+
+    ##
+    # Stop the producer, if it is still running.
+    #
+    # This is needed when the rows could not all be consumed, as the
+    # producer would otherwise wait forever on the full queue.
+    #
+    def stopProducer(self):
+        if self.producer is not None and self.producer.is_alive():
+            self.producer.terminate()
+            self.producer.join()
+
+    def consume(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, basestring):
+                raise RuntimeError('%s: %s' % (self.file.filename, chunk))
+
+            for fields in chunk:
+                if self.cache is not None and 'transcription' in fields:
+                    self.cache.store(fields['gismu'],
+                                     fields['transcription'],
+                                     fields['score'],
+                                     fields['alignment'])
+                yield fields
+
+        self.producer.join()
+
+    def scoreRows(self):
+        batch = []
+        for fields in self.file.load():
+            batch.append(fields)
+            if len(batch) == self.batchsize:
+                for fields in self.scoreBatch(batch):
+                    yield fields
+                batch = []
+
+        for fields in self.scoreBatch(batch):
+            yield fields
+
+    def scoreBatch(self, batch):
+        if self.cache is not None:
+            for fields in batch:
+                if 'transcription' in fields:
+                    row = self.cache.lookup(fields['gismu'],
+                                            fields['transcription'])
+                    if row is not None:
+                        fields['score'], fields['alignment'] = row
+
+        missed = ['score' not in fields for fields in batch]
+
+        for fields, miss in zip(self.pool.imap(scoreFields, batch,
+                                               self.chunksize),
+                                missed):
+            if miss and self.cache is not None and 'transcription' in fields:
+                self.cache.store(fields['gismu'],
+                                 fields['transcription'],
+                                 fields['score'],
+                                 fields['alignment'])
+            yield fields
+
+    def name(self):
+        return os.path.basename(self.file.filename)
+
+    def version(self):
+        return '%d.%d' % (LOADER_VERSION, SCORE_VERSION)
+
+    def digest(self):
+        with open(self.file.filename, 'rb') as file:
+            return hashlib.sha1(file.read()).hexdigest()
+
+    ##
+    # Record the version and hash of the file.
+    #
+    def record(self, files):
+        name = self.name()
+
+        files.deleteWhere(filename=name)
+        files.insert(dict(filename=name,
+                          hash=self.digest(),
+                          version=self.version()))
+        files.flush()
+
+    ##
+    # Return true if the file was recorded by this loader version.
+    #
+    def isRecorded(self, files):
+        for row in files.select('version', filename=self.name()):
+            return row['version'] == self.version()
+        return False
+
+    ##
+    # Return the rows parsed from the file, as stored in each table.
+    #
+    # The result maps every table to the list of its rows, in the order
+    # of the file.  The file is parsed only once.
+    #
+    def parse(self):
+        if self.parsed is None:
+            self.parsed = dict((table, []) for table in self.tables)
+
+            self.file.open()
+            for fields in self.file.load():
+                for table in self.tables:
+                    for row in table.rows(fields):
+                        self.parsed[table].append(table.values(row))
+            self.file.close()
+
+        return self.parsed
+
+    ##
+    # Apply the changes in the file since it was recorded.
+    #
+    # The rows in each table are compared with the rows parsed from the
+    # file, together with the rows parsed by the other loaders into the
+    # same table, such as the keywords of the gismu file and the oblique
+    # keywords file, or the source words of every language.  Rows are
+    # compared by gismu, in rowid order, since gismu are read with their
+    # rows in that order.  Every gismu whose rows differ has them deleted
+    # and inserted again in the order of the files, so that they end up
+    # as in a full load, and is added to changed.  Tables without gismu
+    # are rewritten as a whole if any of their rows differ.  Return false
+    # if the file is unchanged.
+    #
+    def update(self, files, loaders):
+        name = self.name()
+
+        for row in files.select('hash', filename=name):
+            if row['hash'] == self.digest():
+                return False
+
+        for table in self.tables:
+            # all rows of the table, whatever their language
+            table = Table(table.connection, table.tablename,
+                          table.attributes, types=table.types)
+            table.open()
+
+            if 'gismu' in table.attributes:
+                position = table.attributes.index('gismu')
+                group = lambda values: values[position]
+            else:
+                group = lambda values: None
+
+            parsed = defaultdict(list)
+            for loader in loaders:
+                for other in loader.tables:
+                    if other.tablename == table.tablename:
+                        for values in loader.parse()[other]:
+                            parsed[group(values)].append(values)
+
+            stored = defaultdict(list)
+            for row in table.select(order='rowid'):
+                values = table.values(row)
+                stored[group(values)].append(values)
+
+            keys = [key for key in set(parsed) | set(stored)
+                    if parsed[key] != stored[key]]
+
+            for key in keys:
+                if key is None:
+                    table.deleteWhere()
+                else:
+                    table.deleteWhere(gismu=key)
+                    self.changed.add(key)
+
+            for key in keys:
+                for values in parsed[key]:
+                    table.insertValues(values)
+
             table.commit()
+            table.close()
+
+        self.record(files)
+        return True
+
+    def setScoreCache(self, cache):
+        self.cache = cache
+        for table in self.tables:
+            if isinstance(table, SourcewordTable):
+                table.cache = cache
+
+    def setBatchSize(self, batchsize):
+        for table in self.tables:
+            table.batchsize = batchsize
+
+    ##
+    # Leave committing and creating indexes to the caller.
+    #
+    def setFastLoad(self):
+        self.fast = True
+
+    def setPool(self, pool, chunksize=32, batchsize=1024):
+        self.pool = pool
+        self.chunksize = chunksize
+        self.batchsize = batchsize
 
     def close(self):
-        self.file.close()
+        if self.producer is None:
+            self.file.close()
         for table in self.tables:
             table.close()
 
@@ -55,21 +342,24 @@ class ObliqueKeywordsLoader(Loader):
             Table(
                 connection,
                 'Keywords',
-                ['gismu', 'place', 'keyword']))
+                ['gismu', 'place', 'keyword'],
+                ['gismu', 'keyword'],
+                dict(place='integer')))
 
 ##
-# Load data from a TAB separated file into one or many tables.
+# Load data from a TAB separated file into one or many source word
+# tables.
 #
 class TabLoader(Loader):
     def __init__(self, filename, *tables):
         super(TabLoader, self).__init__(
-            TabFile(filename, [attribute
+            TabFile(filename, [field
                                for table in tables
-                               for attribute in table.attributes]),
+                               for field in table.fields]),
             *tables)
 
 ##
-# Load data into the Arabic table.
+# Load the Arabic source words.
 #
 class ArabicLoader(TabLoader):
     def __init__(self, connection, filename):
@@ -78,7 +368,7 @@ class ArabicLoader(TabLoader):
             ArabicTable(connection))
 
 ##
-# Load data into the Chinese table.
+# Load the Chinese source words.
 #
 class ChineseLoader(TabLoader):
     def __init__(self, connection, filename):
@@ -87,7 +377,7 @@ class ChineseLoader(TabLoader):
             ChineseTable(connection))
 
 ##
-# Load data into the English table.
+# Load the English source words.
 #
 class EnglishLoader(TabLoader):
     def __init__(self, connection, filename):
@@ -96,7 +386,7 @@ class EnglishLoader(TabLoader):
             EnglishTable(connection))
 
 ##
-# Load data into the Hindi table.
+# Load the Hindi source words.
 #
 class HindiLoader(TabLoader):
     def __init__(self, connection, filename):
@@ -105,7 +395,7 @@ class HindiLoader(TabLoader):
             HindiTable(connection))
 
 ##
-# Load data into the Russian table.
+# Load the Russian source words.
 #
 class RussianLoader(TabLoader):
     def __init__(self, connection, filename):
@@ -114,7 +404,7 @@ class RussianLoader(TabLoader):
             RussianTable(connection))
 
 ##
-# Load data into the Spanish table.
+# Load the Spanish source words.
 #
 class SpanishLoader(TabLoader):
     def __init__(self, connection, filename):
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+
+from gismutables import DefinitionTable
+from gismuscore import score, letterpairs, letterpairPositions
+
+import sqlite3
+from collections import defaultdict
+from optparse import OptionParser
+
+##
+# Inverted index from letters and letter pairs to gismu.
+#
+# The index finds the gismu scoring highest for a word without scoring
+# every gismu.  A gismu can only score 2 if it shares a letter pair
+# with the word, and it can only score 3 or more if at least three of
+# its letters occur in the word.  The number of such letters is an
+# upper bound for the score, so candidates are scored in order of
+# decreasing bound until the bound drops below the best k scores.
+#
+class GismuIndex(object):
+    def __init__(self, gismus):
+        self.letters = defaultdict(list)
+        self.pairs = defaultdict(set)
+
+        for gismu in gismus:
+            counts = defaultdict(int)
+            for c in gismu:
+                counts[c] += 1
+            for c, n in counts.iteritems():
+                self.letters[c].append((gismu, n))
+            for i, j in letterpairPositions:
+                if j < len(gismu):
+                    self.pairs[gismu[i] + gismu[j]].add(gismu)
+
+    @classmethod
+    def fromConnection(cls, connection):
+        table = DefinitionTable(connection)
+        table.open()
+        gismus = [row['gismu'] for row in table.select('gismu')]
+        table.close()
+        return cls(gismus)
+
+    def bounds(self, word):
+        counts = defaultdict(int)
+        for c in word:
+            counts[c] += 1
+
+        matches = defaultdict(int)
+        for c, n in counts.iteritems():
+            for gismu, m in self.letters.get(c, ()):
+                matches[gismu] += min(n, m)
+
+        bounds = dict((gismu, n)
+                      for gismu, n in matches.iteritems() if n >= 3)
+
+        for pair in set(letterpairs(word)):
+            for gismu in self.pairs.get(pair, ()):
+                bounds.setdefault(gismu, 2)
+
+        return bounds
+
+    def lookup(self, word, k=10):
+        bounds = self.bounds(word)
+        candidates = sorted(bounds.iteritems(),
+                            key=lambda (gismu, bound): (-bound, gismu))
+
+        result = []
+        for gismu, bound in candidates:
+            if len(result) >= k and bound < result[k-1][1]:
+                break
+            s = score(gismu, word)
+            if s:
+                result.append((gismu, s))
+                result.sort(key=lambda (gismu, s): (-s, gismu))
+
+        return result[:k]
+
+##
+# Print the best gismu for each word.
+#
+def main(filename, words, k):
+    index = GismuIndex.fromConnection(sqlite3.connect(filename))
+
+    for word in words:
+        print '%s:' % word
+        for gismu, s in index.lookup(word, k):
+            print '  %s %d' % (gismu, s)
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] transcription...')
+    parser.add_option('-d', '--database', default='dictionary.sql',
+                      help='read gismu from DATABASE')
+    parser.add_option('-k', type='int', default=10,
+                      help='print the K best gismu')
+    options, args = parser.parse_args()
+
+    main(options.database,
+         [arg.decode('utf-8') for arg in args],
+         options.k)
@@ -0,0 +1,240 @@
+#!/usr/bin/python
+
+from gismutables import *
+from gismuscore import score, scoreMatrix, numpy
+
+import sqlite3
+from optparse import OptionParser
+
+consonants = 'bcdfgjklmnprstvxz'
+vowels = 'aeiou'
+voiced = 'bdgjvz'
+unvoiced = 'cfkpstx'
+sibilants = 'cjsz'
+
+##
+# Permissible initial consonant pairs.
+#
+initialPairs = set('''\
+bl br cf ck cl cm cn cp cr ct dj dr dz fl fr gl gr jb jd jg jm jv kl kr
+ml mr pl pr sf sk sl sm sn sp sr st tc tr ts vl vr xl xr zb zd zg zm zv
+'''.split())
+
+##
+# Return true if the consonants c and d may be adjacent inside a word.
+#
+def isPermissibleMedial(c, d):
+    if c == d:
+        return False
+    if c in voiced and d in unvoiced or c in unvoiced and d in voiced:
+        return False
+    if c in sibilants and d in sibilants:
+        return False
+    if c + d in ('cx', 'kx', 'xc', 'xk', 'mz'):
+        return False
+    return True
+
+##
+# Generate all gismu forms with permissible consonant pairs.
+#
+def candidates():
+    for c in consonants:
+        for v in vowels:
+            for d in consonants:
+                for e in consonants:
+                    if isPermissibleMedial(d, e):
+                        for w in vowels:
+                            yield c + v + d + e + w
+
+    for pair in sorted(initialPairs):
+        for v in vowels:
+            for c in consonants:
+                for w in vowels:
+                    yield pair + v + c + w
+
+##
+# Language weights used for the gismu of 1994.
+#
+weights = dict(Chinese=0.36,
+               English=0.21,
+               Hindi=0.16,
+               Spanish=0.11,
+               Russian=0.09,
+               Arabic=0.07)
+
+##
+# Find the best gismu forms for a set of source words.
+#
+# The score of a candidate for a source word is its score from
+# gismuscore divided by the length of the transcription.  The total
+# score is the weighted sum over all languages.
+#
+# The search is pruned using an upper bound on each score: the number
+# of candidate letters that also occur in the transcription, counting
+# repeated letters at most as often as they occur in both.  Candidates
+# are scored in blocks, in order of decreasing bound, until the bound
+# falls below the scores already found.
+#
+class GismuMaker(object):
+    def __init__(self, forms=None, weights=weights, blocksize=4096):
+        self.forms = sorted(forms or candidates())
+        self.weights = weights
+        self.blocksize = blocksize
+
+    def total(self, gismu, transcriptions):
+        return sum(self.weights[language] *
+                   score(gismu, word) / float(len(word))
+                   for language, word in transcriptions.iteritems()
+                   if word)
+
+    def bounds(self, transcriptions):
+        if numpy is None:
+            return self._bounds(transcriptions)
+
+        forms = numpy.array([map(ord, form) for form in self.forms])
+        result = numpy.zeros(len(self.forms))
+
+        for language, word in transcriptions.iteritems():
+            if not word:
+                continue
+
+            shared = numpy.zeros(len(self.forms), dtype=numpy.int32)
+            for c in set(word):
+                shared += numpy.minimum((forms == ord(c)).sum(axis=1),
+                                        word.count(c))
+
+            bound = numpy.where(shared >= 3, shared,
+                                numpy.where(shared >= 2, 2, 0))
+            result += self.weights[language] * bound / float(len(word))
+
+        return result
+
+    def _bounds(self, transcriptions):
+        result = [0.0] * len(self.forms)
+
+        for language, word in transcriptions.iteritems():
+            if not word:
+                continue
+
+            weight = self.weights[language] / float(len(word))
+            for i, form in enumerate(self.forms):
+                shared = sum(min(form.count(c), word.count(c))
+                             for c in set(form))
+                if shared >= 3:
+                    result[i] += weight * shared
+                elif shared >= 2:
+                    result[i] += weight * 2
+
+        return result
+
+    def scores(self, forms, transcriptions):
+        languages = [language
+                     for language, word in transcriptions.iteritems()
+                     if word]
+        words = [transcriptions[language] for language in languages]
+        matrix = scoreMatrix(words, forms)
+
+        return [sum(self.weights[language] * matrix[i][j] /
+                    float(len(words[i]))
+                    for i, language in enumerate(languages))
+                for j in xrange(len(forms))]
+
+    def search(self, transcriptions, k=10, threshold=None):
+        bounds = self.bounds(transcriptions)
+        order = sorted(xrange(len(self.forms)), key=lambda i: -bounds[i])
+
+        result = []
+        for begin in xrange(0, len(order), self.blocksize):
+            block = order[begin:begin+self.blocksize]
+
+            if threshold is not None:
+                if bounds[block[0]] <= threshold:
+                    break
+            elif len(result) >= k and bounds[block[0]] < result[k-1][1]:
+                break
+
+            forms = [self.forms[i] for i in block]
+            result.extend(zip(forms, self.scores(forms, transcriptions)))
+            result.sort(key=lambda (form, total): (-total, form))
+
+            if threshold is None:
+                del result[k:]
+
+        if threshold is not None:
+            result = [(form, total) for form, total in result
+                      if total > threshold]
+
+        return result
+
+    def best(self, transcriptions, k=10):
+        return self.search(transcriptions, k)
+
+    def better(self, gismu, transcriptions):
+        return self.search(transcriptions,
+                           threshold=self.total(gismu, transcriptions))
+
+##
+# Return the best scoring transcription per language for each gismu.
+#
+def loadTranscriptions(connection):
+    names = dict((id, language) for id, langcode, language in languages)
+    best = {}
+
+    table = SourcewordTable(connection)
+    table.open()
+    for row in table.select('gismu', 'language', 'transcription', 'score'):
+        key = row['gismu'], names[row['language']]
+        if row['transcription'] and (
+            key not in best or row['score'] > best[key][1]):
+            best[key] = (row['transcription'], row['score'])
+    table.close()
+
+    result = {}
+    for (gismu, language), (transcription, s) in sorted(best.iteritems()):
+        result.setdefault(gismu, {})[language] = transcription
+
+    return result
+
+##
+# Print the best candidates for each gismu.
+#
+def propose(maker, transcriptions, gismus, k):
+    for gismu in gismus:
+        print '%s:' % gismu
+        for form, total in maker.best(transcriptions.get(gismu, {}), k):
+            print '  %s %.3f' % (form, total)
+
+##
+# Print how each gismu ranks among all candidates for its source words.
+#
+def audit(maker, transcriptions, gismus):
+    for gismu in gismus:
+        words = transcriptions.get(gismu, {})
+        better = maker.better(gismu, words)
+        print '%s %.3f rank %d%s' % (
+            gismu,
+            maker.total(gismu, words),
+            len(better) + 1,
+            ' best %s %.3f' % better[0] if better else '')
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] [gismu...]')
+    parser.add_option('-d', '--database', default='dictionary.sql',
+                      help='read source words from DATABASE')
+    parser.add_option('-k', type='int', default=10,
+                      help='print the K best candidates')
+    parser.add_option('-a', '--audit', action='store_true',
+                      help='rank each gismu among all candidates')
+    options, args = parser.parse_args()
+
+    transcriptions = loadTranscriptions(sqlite3.connect(options.database))
+    gismus = args or sorted(transcriptions)
+    maker = GismuMaker()
+
+    if options.audit:
+        audit(maker, transcriptions, gismus)
+    else:
+        propose(maker, transcriptions, gismus, options.k)
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+
+from gismu import *
+
+import sys
+import sqlite3
+from collections import defaultdict
+from optparse import OptionParser
+
+##
+# Return the size of an object and everything it refers to.
+#
+# Objects in seen are not counted again, and every object counted is
+# added to it.  Classes are not counted, so attributes stored in the
+# class cost nothing per instance.
+#
+def deepsize(obj, seen):
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += deepsize(key, seen) + deepsize(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deepsize(item, seen)
+
+    if hasattr(obj, '__dict__'):
+        size += deepsize(obj.__dict__, seen)
+
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            if hasattr(obj, name):
+                size += deepsize(getattr(obj, name), seen)
+
+    return size
+
+##
+# Gismu and source words stored in instance dictionaries.
+#
+# These are laid out as gismu and source words were before they had
+# slots: each instance has a dictionary with its own language, and
+# keywords are sets.
+#
+class DictGismu(object):
+    def __init__(self, gismu):
+        self.gismu = gismu.gismu
+        self.definition = gismu.definition
+        self.comment = gismu.comment
+        self.xrefs = gismu.xrefs
+        self.rafsi = gismu.rafsi
+        self.keywords = defaultdict(set)
+        for place, words in gismu.keywords.iteritems():
+            self.keywords[place].update(words)
+        self.sourcewords = [DictSourceword(sourceword)
+                            for sourceword in gismu.sourcewords]
+
+class DictSourceword(object):
+    def __init__(self, sourceword):
+        self.langcode = sourceword.langcode
+        self.language = sourceword.language
+        for name in Sourceword.__slots__:
+            setattr(self, name, getattr(sourceword, name))
+
+##
+# Return the bytes per gismu and per source word.
+#
+# The source words are counted on their own, and the gismu without
+# them.
+#
+def measure(gismus):
+    sourcewords = [sourceword
+                   for gismu in gismus
+                   for sourceword in gismu.sourcewords]
+
+    seen = set(id(sourceword) for sourceword in sourcewords)
+    gismusize = sum(deepsize(gismu, seen) for gismu in gismus)
+
+    seen = set()
+    sourcewordsize = sum(deepsize(sourceword, seen)
+                         for sourceword in sourcewords)
+
+    return (gismusize / float(len(gismus)),
+            sourcewordsize / float(len(sourcewords)))
+
+##
+# Print the memory used by all gismu, with and without slots.
+#
+def main(filename):
+    gismus = GismuFactory(sqlite3.connect(filename)).createAll().values()
+    count = sum(len(gismu.sourcewords) for gismu in gismus)
+
+    before = measure([DictGismu(gismu) for gismu in gismus])
+    after = measure(gismus)
+
+    print '%d gismu, %d source words' % (len(gismus), count)
+    print
+    print '%-12s  %8s  %8s' % ('bytes', 'before', 'after')
+    print '%-12s  %8.0f  %8.0f' % ('gismu', before[0], after[0])
+    print '%-12s  %8.0f  %8.0f' % ('source word', before[1], after[1])
+    print '%-12s  %8.0f  %8.0f' % (
+        'total kB',
+        (before[0] * len(gismus) + before[1] * count) / 1024,
+        (after[0] * len(gismus) + after[1] * count) / 1024)
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [database]')
+    options, args = parser.parse_args()
+
+    if args:
+        main(args[0])
+    else:
+        main('dictionary.sql')
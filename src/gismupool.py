@@ -0,0 +1,146 @@
+#!/usr/bin/python
+
+from gismu import *
+
+import random
+import sqlite3
+import threading
+from timeit import default_timer
+from optparse import OptionParser
+
+##
+# Pool of gismu factories, one per thread.
+#
+# Each thread gets a factory of its own, on a connection of its own,
+# opened on first use and kept for the life of the pool.  Connections
+# are read-only, and cache up to cachesize prepared statements; the
+# factory queries are the same on every call, so they are prepared
+# only once per thread.
+#
+# Lazy gismu load their data through the factory of the thread that
+# created them, and should not be passed to another thread.
+#
+class GismuFactoryPool(object):
+    def __init__(self, filename, factoryclass=GismuFactory, cachesize=100):
+        self.filename = filename
+        self.factoryclass = factoryclass
+        self.cachesize = cachesize
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+
+    ##
+    # Open a read-only connection.
+    #
+    # The connection may be closed by another thread than the one
+    # using it, when the pool is closed.
+    #
+    def connect(self):
+        connection = sqlite3.connect(self.filename,
+                                     check_same_thread=False,
+                                     cached_statements=self.cachesize)
+        connection.execute('pragma query_only = 1')
+
+        with self.lock:
+            self.connections.append(connection)
+
+        return connection
+
+    ##
+    # Return the factory of the calling thread.
+    #
+    def factory(self):
+        factory = getattr(self.local, 'factory', None)
+        if factory is None:
+            factory = self.factoryclass(self.connect())
+            self.local.factory = factory
+        return factory
+
+    def gismu(self, **where):
+        return self.factory().gismu(**where)
+
+    def create(self, gismu):
+        return self.factory().create(gismu)
+
+    def createAll(self):
+        return self.factory().createAll()
+
+    def createMany(self, gismus):
+        return self.factory().createMany(gismus)
+
+    def createLazy(self, gismu):
+        return self.factory().createLazy(gismu)
+
+    def createLazyMany(self, gismus, prefetch=()):
+        return self.factory().createLazyMany(gismus, prefetch)
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
+
+##
+# Return the number of lookups per second made by a number of threads
+# sharing a pool.
+#
+# Every thread creates gismu picked at random, until the given time has
+# passed.
+#
+def stress(pool, gismus, threads, seconds):
+    counts = [0] * threads
+
+    def lookup(n):
+        generator = random.Random(n)
+        stop = default_timer() + seconds
+        while default_timer() < stop:
+            pool.create(generator.choice(gismus))
+            counts[n] += 1
+
+    workers = [threading.Thread(target=lookup, args=(n,))
+               for n in xrange(threads)]
+
+    start = default_timer()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return sum(counts) / (default_timer() - start)
+
+##
+# Print the lookup throughput by thread count.
+#
+def main(filename, threadcounts, seconds):
+    pool = GismuFactoryPool(filename)
+    gismus = sorted(pool.gismu())
+
+    print '%7s  %10s' % ('threads', 'lookups/s')
+    for threads in threadcounts:
+        print '%7d  %10.0f' % (threads,
+                               stress(pool, gismus, threads, seconds))
+
+    pool.close()
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] [database]')
+    parser.add_option('-t', '--threads', type='int', default=8,
+                      help='stress with up to THREADS threads')
+    parser.add_option('-s', '--seconds', type='float', default=2.0,
+                      help='run each stress test for SECONDS')
+    options, args = parser.parse_args()
+
+    if args:
+        filename = args[0]
+    else:
+        filename = 'dictionary.sql'
+
+    threadcounts = [1]
+    while threadcounts[-1] * 2 <= options.threads:
+        threadcounts.append(threadcounts[-1] * 2)
+
+    main(filename, threadcounts, options.seconds)
@@ -1,3 +1,8 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 ##
 # Generate all subsequences of xs.
 #
@@ -37,6 +42,14 @@ def isSubsequence(haystack, needle):
             return False
     return True
 
+##
+# Version of the scoring algorithm.
+#
+# Increment this whenever a change to this module changes any score,
+# so that persistently cached scores are invalidated.
+#
+SCORE_VERSION = 1
+
 ##
 # Return the number of common subsequences.
 #
@@ -50,6 +63,27 @@ def commonSubsequences(gismu, word):
                 max = l
     return max
 
+##
+# Return the length of the longest common subsequence.
+#
+# This computes the same number as commonSubsequences, using the
+# usual dynamic programming table instead of enumerating every
+# subsequence of word.  Only the previous row of the table is kept.
+#
+def longestCommonSubsequence(gismu, word):
+    previous = [0] * (len(gismu) + 1)
+    for c in word:
+        current = [0]
+        for i, d in enumerate(gismu):
+            if c == d:
+                current.append(previous[i] + 1)
+            elif current[i] > previous[i+1]:
+                current.append(current[i])
+            else:
+                current.append(previous[i+1])
+        previous = current
+    return previous[-1]
+
 ##
 # Generate the letter pairs.
 #
@@ -76,18 +110,92 @@ def findall(s, c):
             break
         yield i
 
+##
+# Positions of the letter pairs of a gismu.
+#
+# The letters at positions i and j of a gismu form a letter pair for
+# every (i, j) in this list, as long as j is within the gismu.  The
+# list is ordered by i, and by j for each i.
+#
+letterpairPositions = [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (2, 4), (3, 4)]
+
 ##
 # Return true if there is a common letter pair.
 #
 def commonLetterpair(gismu, word):
     for c, d in letterpairs(word):
-        for i in findall(gismu, c):
-            if i <= 3 and d == gismu[i+1]:
-                return True
-            if i <= 2 and d == gismu[i+2]:
+        for i, j in letterpairPositions:
+            if j < len(gismu) and c == gismu[i] and d == gismu[j]:
                 return True
     return False
 
+##
+# Precomputed data for scoring against a gismu.
+#
+# For every letter of the gismu, a bitmask of the positions where it
+# occurs; a mask of all positions; and the set of letter pairs that
+# commonLetterpair matches in the gismu.
+#
+# Kernels are kept for up to kernelCacheSize gismu, which is more than
+# the number of gismu in the dictionary.  When the cache is full, it is
+# emptied before adding another kernel.
+#
+kernels = {}
+kernelCacheSize = 4096
+
+def kernel(gismu):
+    if gismu not in kernels:
+        if len(kernels) >= kernelCacheSize:
+            kernels.clear()
+
+        masks = {}
+        for i, c in enumerate(gismu):
+            masks[c] = masks.get(c, 0) | 1 << i
+
+        pairs = set()
+        for i, j in letterpairPositions:
+            if j < len(gismu):
+                pairs.add(gismu[i] + gismu[j])
+
+        kernels[gismu] = (masks, (1 << len(gismu)) - 1, pairs)
+
+    return kernels[gismu]
+
+##
+# Return the length of the longest common subsequence.
+#
+# This is the bit-parallel algorithm of Hyyroe, keeping one column of
+# the dynamic programming table in the bits of an integer.  The number
+# of zero bits is the length of the longest common subsequence.
+#
+def bitParallelLCS(gismu, word):
+    masks, full, pairs = kernel(gismu)
+    v = full
+    for c in word:
+        m = masks.get(c, 0)
+        v = ((v + (v & m)) | (v & ~m)) & full
+    return len(gismu) - bin(v).count('1')
+
+##
+# Return the score of word for gismu, using the bit-parallel kernel.
+#
+def bitParallelScore(gismu, word):
+    matches = bitParallelLCS(gismu, word)
+    if matches >= 3:
+        return matches
+    masks, full, pairs = kernel(gismu)
+    for i in xrange(len(word) - 1):
+        if word[i:i+2] in pairs or word[i] + word[i+2:i+3] in pairs:
+            return 2
+    return 0
+
+##
+# Algorithms for computing the number of common subsequences.
+#
+algorithms = dict(legacy=commonSubsequences,
+                  lcs=longestCommonSubsequence,
+                  bitparallel=bitParallelLCS)
+
 ##
 # Return the score of word for gismu.
 #
@@ -95,10 +203,241 @@ def commonLetterpair(gismu, word):
 # exceeds 2.  Otherwise, the score is two if there is a common letter
 # pair. Otherwise, the score is zero.
 #
-def score(gismu, word):
-    matches = commonSubsequences(gismu, word)
+def score(gismu, word, algorithm='bitparallel'):
+    if algorithm == 'bitparallel':
+        return bitParallelScore(gismu, word)
+
+    matches = algorithms[algorithm](gismu, word)
     if matches >= 3:
         return matches
     if commonLetterpair(gismu, word):
         return 2
     return 0
+
+##
+# Return the letters matched by the longest common subsequence.
+#
+# The result is a list of (i, j) pairs such that gismu[i] matches
+# word[j], found by tracing back through the dynamic programming table.
+#
+def commonSubsequenceAlignment(gismu, word):
+    table = [[0] * (len(gismu) + 1)]
+    for c in word:
+        previous, current = table[-1], [0]
+        for i, d in enumerate(gismu):
+            if c == d:
+                current.append(previous[i] + 1)
+            else:
+                current.append(max(current[i], previous[i+1]))
+        table.append(current)
+
+    result = []
+    i, j = len(gismu), len(word)
+    while i and j:
+        if gismu[i-1] == word[j-1]:
+            i, j = i - 1, j - 1
+            result.append((i, j))
+        elif table[j][i-1] >= table[j-1][i]:
+            i -= 1
+        else:
+            j -= 1
+
+    result.reverse()
+    return result
+
+##
+# Return the letters matched by the longest common subsequence, using
+# the bit-parallel kernel.
+#
+# This gives the same pairs as commonSubsequenceAlignment.  The bit
+# vector of bitParallelLCS is kept, inverted, after every letter of
+# word.  Bit i of the vector for the first j letters is set if and only
+# if the entry of the dynamic programming table at (j, i+1) exceeds the
+# one at (j, i).  Where the letters differ, the trace back moves along
+# gismu exactly when that bit is clear.
+#
+def bitParallelAlignment(gismu, word):
+    masks, full, pairs = kernel(gismu)
+    v = full
+    columns = [0]
+    for c in word:
+        m = masks.get(c, 0)
+        v = ((v + (v & m)) | (v & ~m)) & full
+        columns.append(~v & full)
+
+    result = []
+    i, j = len(gismu), len(word)
+    while i and j:
+        if gismu[i-1] == word[j-1]:
+            i, j = i - 1, j - 1
+            result.append((i, j))
+        elif not columns[j] >> (i - 1) & 1:
+            i -= 1
+        else:
+            j -= 1
+
+    result.reverse()
+    return result
+
+##
+# Return the letters matched by the first common letter pair.
+#
+def letterpairAlignment(gismu, word):
+    for j in xrange(len(word) - 1):
+        for k in (j + 1, j + 2):
+            if k >= len(word):
+                break
+            for i, l in letterpairPositions:
+                if (l < len(gismu) and
+                    word[j] == gismu[i] and word[k] == gismu[l]):
+                    return [(i, j), (l, k)]
+    return []
+
+##
+# Return the score of word for gismu, and the letters it matches.
+#
+# The letters are a list of (i, j) pairs such that gismu[i] matches
+# word[j]: the longest common subsequence for a score of 3 or more,
+# the common letter pair for a score of 2, and nothing otherwise.
+#
+# Explanations are not cached here; the loaders keep them in the
+# persistent score cache.
+#
+def explain(gismu, word):
+    result = score(gismu, word)
+    if result >= 3:
+        alignment = bitParallelAlignment(gismu, word)
+    elif result == 2:
+        alignment = letterpairAlignment(gismu, word)
+    else:
+        alignment = []
+    return result, alignment
+
+##
+# Convert an alignment to and from its textual form, such as "0:1 2:3".
+#
+def formatAlignment(alignment):
+    return ' '.join('%d:%d' % (i, j) for i, j in alignment)
+
+def parseAlignment(text):
+    return [tuple(map(int, pair.split(':'))) for pair in text.split()]
+
+##
+# Encode words as a matrix of letter codes.
+#
+# Each row holds the codes of one word, padded to the given width with
+# the code pad.  Letters missing from the alphabet are encoded as zero.
+#
+def encode(words, alphabet, width, pad):
+    matrix = numpy.empty((len(words), width), dtype=numpy.int32)
+    matrix.fill(pad)
+    for row, word in enumerate(words):
+        for column, c in enumerate(word):
+            matrix[row, column] = alphabet.get(c, 0)
+    return matrix
+
+##
+# Return the score matrix of words for a list of gismu.
+#
+# The element at row i and column j is score(gismus[j], words[i]).
+# The words are scored in chunks of the given size, each chunk in a
+# single pass of array operations over all gismu.  Without NumPy, this
+# falls back to calling score for every pair, and a list of lists is
+# returned instead of an array.
+#
+def scoreMatrix(words, gismus, chunksize=64):
+    if numpy is None:
+        return [[score(gismu, word) for gismu in gismus]
+                for word in words]
+
+    letters = sorted(set(c for gismu in gismus for c in gismu))
+    alphabet = dict((c, code) for code, c in enumerate(letters, 1))
+    base = len(letters) + 1
+
+    width = max([len(gismu) for gismu in gismus] or [0])
+    gismuarray = encode(gismus, alphabet, width, -1)
+
+    pairs = numpy.zeros((len(gismus), base * base), dtype=bool)
+    for row, gismu in enumerate(gismus):
+        for i, j in letterpairPositions:
+            if j < len(gismu):
+                pairs[row, alphabet[gismu[i]] * base +
+                      alphabet[gismu[j]]] = True
+
+    result = numpy.zeros((len(words), len(gismus)), dtype=numpy.int32)
+
+    for begin in xrange(0, len(words), chunksize):
+        chunk = words[begin:begin+chunksize]
+        length = max([len(word) for word in chunk] + [3])
+        wordarray = encode(chunk, alphabet, length, 0)
+
+        previous = numpy.zeros((len(chunk), len(gismus), width + 1),
+                               dtype=numpy.int32)
+        for column in xrange(length):
+            equal = wordarray[:, column, None, None] == gismuarray[None]
+            current = numpy.zeros_like(previous)
+            for i in xrange(width):
+                current[:, :, i+1] = numpy.where(
+                    equal[:, :, i],
+                    previous[:, :, i] + 1,
+                    numpy.maximum(current[:, :, i], previous[:, :, i+1]))
+            previous = current
+        matches = previous[:, :, width]
+
+        wordpairs = numpy.hstack([
+                wordarray[:, :-1] * base + wordarray[:, 1:],
+                wordarray[:, :-2] * base + wordarray[:, 2:]])
+        letterpair = pairs[:, wordpairs].any(axis=2).T
+
+        result[begin:begin+len(chunk)] = numpy.where(
+            matches >= 3, matches, numpy.where(letterpair, 2, 0))
+
+    return result
+
+##
+# Compare the scores of all algorithms, and the alignments of both
+# trace backs, on the source word files.
+#
+def compare(directory):
+    import os
+    import codecs
+
+    mismatches = 0
+    for filename in sorted(os.listdir(directory)):
+        if not filename.startswith('lojban-source-words_'):
+            continue
+
+        for line in codecs.open(os.path.join(directory, filename),
+                                'r', 'utf-8'):
+            fields = map(unicode.strip, line.split('\t'))
+            gismu, word = fields[0], fields[2]
+            scores = dict((algorithm, score(gismu, word, algorithm))
+                          for algorithm in algorithms)
+            if len(set(scores.itervalues())) != 1:
+                print '%s: %s %s %r' % (filename, gismu, word, scores)
+                mismatches += 1
+
+            if (bitParallelAlignment(gismu, word) !=
+                commonSubsequenceAlignment(gismu, word)):
+                print '%s: %s %s alignment' % (filename, gismu, word)
+                mismatches += 1
+
+    print '%d mismatches' % mismatches
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    import sys
+    import os.path
+
+    if len(sys.argv) >= 2:
+        directory = sys.argv[1]
+    else:
+        directory = os.path.join(
+            os.path.dirname(
+                os.path.dirname(
+                    os.path.realpath(sys.argv[0]))),
+            'data')
+
+    compare(directory)
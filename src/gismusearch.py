@@ -0,0 +1,36 @@
+#!/usr/bin/python
+
+from gismutables import SearchTable
+
+import sqlite3
+from optparse import OptionParser
+
+##
+# Print the gismu best matching a query.
+#
+def main(filename, query, k):
+    table = SearchTable(sqlite3.connect(filename))
+    table.open()
+
+    for gismu, score, fields in table.search(query, k):
+        print '%s %.2f (%s)' % (gismu, score, ', '.join(fields))
+
+    table.close()
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] word...')
+    parser.add_option('-d', '--database', default='dictionary.sql',
+                      help='search the gismu in DATABASE')
+    parser.add_option('-k', type='int', default=10,
+                      help='print the K best gismu')
+    options, args = parser.parse_args()
+
+    if not args:
+        parser.error('no words given')
+
+    main(options.database,
+         u' '.join(arg.decode('utf-8') for arg in args),
+         options.k)
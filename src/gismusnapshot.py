@@ -0,0 +1,231 @@
+#!/usr/bin/python
+
+from gismu import *
+
+import os
+import os.path
+import struct
+import marshal
+import sqlite3
+from timeit import default_timer
+from optparse import OptionParser
+
+##
+# Version of the snapshot format.
+#
+# Increment this whenever the rows stored in a snapshot change, so that
+# older snapshots are rebuilt.
+#
+SNAPSHOT_VERSION = 1
+
+##
+# Header of a snapshot: magic, snapshot version and schema version.
+#
+header = struct.Struct('<4sII')
+magic = 'GSNP'
+
+##
+# Return the fingerprint of a database file.
+#
+# Every write to the database changes its modification time, and
+# rebuilding it replaces the file, so a snapshot taken with another
+# fingerprint is stale.
+#
+def fingerprint(filename):
+    status = os.stat(filename)
+    return status.st_size, status.st_mtime
+
+##
+# Snapshot of all gismu in a database.
+#
+# The snapshot holds the rows of every gismu as plain tuples, which are
+# written with marshal after a short header.  It is read back with a
+# single read, and the gismu are built from the rows in the same way as
+# by the factory, so a snapshot can stand in for a factory.
+#
+class Snapshot(GismuFactory):
+    def __init__(self, rows, fingerprint=None):
+        super(Snapshot, self).__init__(None)
+        self.rows = rows
+        self.fingerprint = fingerprint
+
+    ##
+    # Take a snapshot of a database.
+    #
+    @classmethod
+    def fromDatabase(cls, filename):
+        stamp = fingerprint(filename)
+        factory = GismuFactory(sqlite3.connect(filename))
+        factory._openTables()
+
+        definitions = factory.definitions.attributes
+        sourcewords = factory.sourcewords.attributes
+
+        rows = {}
+        for gismu, group in factory.definitions.groups('gismu', definitions):
+            rows[gismu] = [tuple(group[0][name] for name in definitions),
+                           [], [], []]
+        for gismu, group in factory.rafsi.groups('gismu', ['gismu', 'rafsi']):
+            if gismu in rows:
+                rows[gismu][1] = [row['rafsi'] for row in group]
+        for gismu, group in factory.keywords.groups(
+            'gismu', ['gismu', 'place', 'keyword']):
+            if gismu in rows:
+                rows[gismu][2] = [(row['place'], row['keyword'])
+                                  for row in group]
+        for gismu, group in factory.sourcewords.groups('gismu', sourcewords):
+            if gismu in rows:
+                rows[gismu][3] = [tuple(row[name] for name in sourcewords)
+                                  for row in group]
+
+        factory._closeTables()
+
+        return cls(dict((gismu, tuple(entry))
+                        for gismu, entry in rows.iteritems()),
+                   stamp)
+
+    ##
+    # Read a snapshot, or return None if it is missing, of another
+    # version, or corrupt.
+    #
+    @classmethod
+    def read(cls, filename):
+        try:
+            with open(filename, 'rb') as file:
+                data = file.read()
+        except IOError:
+            return None
+
+        if len(data) < header.size:
+            return None
+
+        tag, version, schema = header.unpack_from(data)
+        if (tag, version, schema) != (magic, SNAPSHOT_VERSION,
+                                      SCHEMA_VERSION):
+            return None
+
+        try:
+            stamp, rows = marshal.loads(data[header.size:])
+        except (EOFError, ValueError, TypeError):
+            return None
+        return cls(rows, stamp)
+
+    ##
+    # Read the snapshot of a database, taking it anew if it is stale.
+    #
+    @classmethod
+    def load(cls, filename, databasefilename):
+        snapshot = cls.read(filename)
+        if (snapshot is None or
+            snapshot.fingerprint != fingerprint(databasefilename)):
+            snapshot = cls.fromDatabase(databasefilename)
+            snapshot.write(filename)
+        return snapshot
+
+    def write(self, filename):
+        tempfilename = filename + '.tmp'
+        with open(tempfilename, 'wb') as file:
+            file.write(header.pack(magic, SNAPSHOT_VERSION, SCHEMA_VERSION))
+            file.write(marshal.dumps((self.fingerprint, self.rows)))
+        os.rename(tempfilename, filename)
+
+    def gismu(self, **where):
+        order = where.pop('order', 'gismu')
+        limit = where.pop('limit', None)
+
+        names = self.definitions.attributes
+        for name in where:
+            if name not in names:
+                raise ValueError('Definitions has no attribute %s' % name)
+
+        rows = [dict(zip(names, entry[0])) for entry in self.rows.itervalues()]
+        rows = [row for row in rows
+                if all(matches(condition, row[name])
+                       for name, condition in where.iteritems())]
+
+        if isinstance(order, basestring):
+            order = [order]
+        for name in reversed(order):
+            rows.sort(key=lambda row: row[name.lstrip('-')],
+                      reverse=name.startswith('-'))
+
+        return [row['gismu'] for row in rows[:limit]]
+
+    def create(self, gismu):
+        definition, rafsi, keywords, sourcewords = self.rows[gismu]
+
+        return self._build(
+            gismu,
+            dict(zip(self.definitions.attributes, definition)),
+            [dict(rafsi=value) for value in rafsi],
+            [dict(place=place, keyword=keyword)
+             for place, keyword in keywords],
+            [dict(zip(self.sourcewords.attributes, row))
+             for row in sourcewords])
+
+    def createAll(self):
+        return self.createMany(None)
+
+    def createLazy(self, gismu):
+        return self.create(gismu)
+
+    def createLazyMany(self, gismus, prefetch=()):
+        return self.createMany(gismus)
+
+    def createMany(self, gismus):
+        if gismus is None:
+            gismus = self.rows
+        return dict((gismu, self.create(gismu))
+                    for gismu in gismus if gismu in self.rows)
+
+##
+# Return the attributes of a source word.
+#
+def values(sourceword):
+    return tuple(getattr(sourceword, name) for name in Sourceword.__slots__)
+
+##
+# Take a snapshot and compare the time to build all gismu from it and
+# from the database.
+#
+def main(filename, snapshotfilename):
+    start = default_timer()
+    Snapshot.fromDatabase(filename).write(snapshotfilename)
+    print 'Snapshot written in %.2f s (%d kB)' % (
+        default_timer() - start, os.path.getsize(snapshotfilename) // 1024)
+
+    start = default_timer()
+    expected = GismuFactory(sqlite3.connect(filename)).createAll()
+    print 'Database: %.3f s' % (default_timer() - start)
+
+    start = default_timer()
+    snapshot = Snapshot.load(snapshotfilename, filename)
+    print 'Snapshot read: %.3f s' % (default_timer() - start)
+    actual = snapshot.createAll()
+    print 'Snapshot: %.3f s' % (default_timer() - start)
+
+    for gismu in expected:
+        a, b = expected[gismu], actual[gismu]
+        assert (a.definition, a.comment, a.xrefs, a.rafsi, a.keywords) == (
+            b.definition, b.comment, b.xrefs, b.rafsi, b.keywords), gismu
+        assert ([(type(s),) + values(s) for s in a.sourcewords] ==
+                [(type(s),) + values(s) for s in b.sourcewords]), gismu
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [database [snapshot]]')
+    options, args = parser.parse_args()
+
+    if len(args) >= 1:
+        filename = args[0]
+    else:
+        filename = 'dictionary.sql'
+
+    if len(args) >= 2:
+        snapshotfilename = args[1]
+    else:
+        snapshotfilename = filename + '.snapshot'
+
+    main(filename, snapshotfilename)
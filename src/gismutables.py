@@ -1,77 +1,518 @@
-from gismuscore import score
+from gismuscore import explain, formatAlignment, SCORE_VERSION
+
+from itertools import groupby
+
+##
+# Version of the database schema.
+#
+# This is stored as the user version of every database written by the
+# loaders.  Databases of an earlier version can be brought up to date
+# with migrate.py.
+#
+SCHEMA_VERSION = 2
+
+##
+# Return the schema version of a database, or None if it is empty.
+#
+# Databases written before the schema was versioned have version 1.
+#
+def schemaVersion(connection):
+    version = connection.execute('pragma user_version').fetchone()[0]
+    if version:
+        return version
+
+    for row in connection.execute(
+        "select name from sqlite_master where type = 'table'"):
+        return 1
+
+    return None
+
+##
+# Languages of the source words, as id, language code and name.
+#
+languages = [
+    (1, 'zh', 'Chinese'),
+    (2, 'hi', 'Hindi'),
+    (3, 'ar', 'Arabic'),
+    (4, 'ru', 'Russian'),
+    (5, 'es', 'Spanish'),
+    (6, 'en', 'English')]
+
+##
+# Return the score of a transcription and the letters it matches.
+#
+# The alignment is returned in textual form, as stored in the tables.
+#
+def scoreTranscription(gismu, transcription):
+    result, alignment = explain(gismu, transcription)
+    return result, formatAlignment(alignment)
+
+##
+# Condition on the value of an attribute.
+#
+# Predicates are given as values in the where clauses of Table.select,
+# in place of a value the attribute must equal.  Each returns its SQL
+# for the attribute, along with the values to bind, and can also be
+# matched against a value in Python.
+#
+class Predicate(object):
+    def sql(self, name):
+        raise NotImplementedError
+
+    def match(self, value):
+        raise NotImplementedError
+
+##
+# Condition that a value starts with a prefix.
+#
+# This is expressed as a range rather than with like, so that SQLite
+# can use an index on the attribute.
+#
+class Prefix(Predicate):
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def sql(self, name):
+        if not self.prefix:
+            return '%s is not null' % name, ()
+        end = self.prefix[:-1] + unichr(ord(self.prefix[-1]) + 1)
+        return '%s >= ? and %s < ?' % (name, name), (self.prefix, end)
+
+    def match(self, value):
+        return value is not None and value.startswith(self.prefix)
+
+##
+# Condition that a value lies in a range.
+#
+# The low end is included and the high end excluded.  Either end may
+# be None, for a range open on that side.
+#
+class Range(Predicate):
+    def __init__(self, low=None, high=None):
+        self.low = low
+        self.high = high
+
+    def sql(self, name):
+        terms, values = ['%s is not null' % name], []
+        if self.low is not None:
+            terms.append('%s >= ?' % name)
+            values.append(self.low)
+        if self.high is not None:
+            terms.append('%s < ?' % name)
+            values.append(self.high)
+        return ' and '.join(terms), tuple(values)
+
+    def match(self, value):
+        return (value is not None and
+                (self.low is None or value >= self.low) and
+                (self.high is None or value < self.high))
+
+##
+# Condition that a value is one of a list.
+#
+class In(Predicate):
+    def __init__(self, values):
+        self.values = list(values)
+
+    def sql(self, name):
+        if not self.values:
+            return '0', ()
+        marks = ', '.join(['?'] * len(self.values))
+        return '%s in (%s)' % (name, marks), tuple(self.values)
+
+    def match(self, value):
+        return value in self.values
+
+##
+# Return true if a value satisfies a condition of a where clause.
+#
+def matches(condition, value):
+    if isinstance(condition, Predicate):
+        return condition.match(value)
+    return value == condition
 
 ##
 # Database table.
 #
+# Inserted rows are buffered in the order of the table attributes, and
+# written with a single statement for every batchsize rows.  The
+# buffer is flushed before selecting, committing or closing.
+#
+# Attributes are stored as text, unless types gives another column
+# type.  If key is given, it is the list of attributes making up the
+# primary key; otherwise rows are identified by their rowid only.
+# Indexes are given by attribute name, or by a tuple of names for an
+# index on several attributes.
+#
+# Rows are selected with conditions on attributes, which are either a
+# value to equal or a predicate.  The rows may be ordered and limited,
+# and are streamed from a cursor of their own, so that several
+# selections can be read at the same time.
+#
 class Table(object):
-    def __init__(self, connection, tablename, attributes):
+    batchsize = 500
+
+    def __init__(self, connection, tablename, attributes, indexes=None,
+                 types=None, key=None):
         self.connection = connection
         self.tablename = tablename
         self.attributes = attributes
+        if indexes is None:
+            indexes = [name for name in ['gismu']
+                       if name in attributes and [name] != key]
+        self.indexes = indexes
+        self.types = types or {}
+        self.key = key
         self.cursor = None
+        self.pending = []
+        self.insertSQL = 'insert into %s (%s) values (%s)' % (
+            self.tablename,
+            ', '.join(self.attributes),
+            ', '.join(['?'] * len(self.attributes)))
 
     def open(self):
         self.cursor = self.connection.cursor()
 
     def create(self):
+        columns = ['%s %s' % (attribute, self.types.get(attribute, 'text'))
+                   for attribute in self.attributes]
+        if self.key:
+            columns.append('primary key (%s)' % ', '.join(self.key))
+
         self.cursor.execute('create table if not exists %s (%s)' % (
                 self.tablename,
-                ', '.join(['%s text' % attribute
-                           for attribute in self.attributes])))
+                ', '.join(columns)))
+
+    def createIndexes(self):
+        for names in self.indexes:
+            if isinstance(names, basestring):
+                names = [names]
+            self.cursor.execute(
+                'create index if not exists %s_%s on %s (%s)' % (
+                    self.tablename, '_'.join(names),
+                    self.tablename, ', '.join(names)))
+
+    def rows(self, fields):
+        return [fields]
+
+    ##
+    # Return the values of a row as stored, in the order of the
+    # attributes.
+    #
+    # Integer attributes given as text are converted, as SQLite does
+    # when storing them.
+    #
+    def values(self, row):
+        result = []
+        for name in self.attributes:
+            value = row.get(name)
+            if self.types.get(name) == 'integer' and isinstance(value,
+                                                                basestring):
+                try:
+                    value = int(value)
+                except ValueError:
+                    pass
+            result.append(value)
+        return tuple(result)
 
     def insert(self, fields):
-        names, values = [], []
-        for name, value in fields.iteritems():
-            if name in self.attributes:
-                names.append(name)
-                values.append(value)
+        for row in self.rows(fields):
+            self.insertValues(self.values(row))
 
-        sql = 'insert into %s (%s) values (%s)' % (
-            self.tablename,
-            ', '.join(names),
-            ', '.join(['?'] * len(values)))
+    def insertValues(self, values):
+        self.pending.append(values)
+        if len(self.pending) >= self.batchsize:
+            self.flush()
+
+    def delete(self, fields):
+        for row in self.rows(fields):
+            self.deleteValues(self.values(row))
 
-        self.cursor.execute(sql, tuple(values))
+    ##
+    # Delete a single row with the given values.
+    #
+    def deleteValues(self, values):
+        self.flush()
+        self.cursor.execute(
+            'delete from %s where rowid = ('
+            'select rowid from %s where %s limit 1)' % (
+                self.tablename,
+                self.tablename,
+                ' and '.join('%s is ?' % name for name in self.attributes)),
+            values)
+
+    def deleteWhere(self, **where):
+        self.flush()
+
+        sql, values = self.selectSQL(['rowid'], where)
+        self.cursor.execute(
+            'delete from %s where rowid in (%s)' % (self.tablename, sql),
+            values)
+
+    def flush(self):
+        if self.pending:
+            self.cursor.executemany(self.insertSQL, self.pending)
+            self.pending = []
 
+    ##
+    # Generate the rows matching the conditions in where.
+    #
+    # The special argument order names the attribute, or list of
+    # attributes, to order by, each prefixed with a minus sign to order
+    # descending.  The special argument limit gives the maximum number
+    # of rows.
+    #
     def select(self, *attributes, **where):
+        self.flush()
+
         if not attributes:
             attributes = self.attributes
 
+        order = where.pop('order', None)
+        limit = where.pop('limit', None)
+        sql, values = self.selectSQL(attributes, where, order, limit)
+
+        cursor = self.connection.cursor()
+        try:
+            for row in cursor.execute(sql, values):
+                yield dict(zip(attributes, row))
+        finally:
+            cursor.close()
+
+    def selectSQL(self, attributes, where, order=None, limit=None):
         sql = 'select %s from %s' % (
             ', '.join(attributes),
             self.tablename)
 
-        if where:
-            names, values = [], []
-            for name, value in where.iteritems():
-                if name in self.attributes:
-                    names.append(name)
-                    values.append(value)
+        terms, values = [], []
+        for name, value in sorted(where.iteritems()):
+            if name not in self.attributes:
+                raise ValueError('%s has no attribute %s' % (
+                        self.tablename, name))
+
+            if isinstance(value, Predicate):
+                term, bound = value.sql(name)
+                terms.append(term)
+                values.extend(bound)
+            else:
+                terms.append('%s = ?' % name)
+                values.append(value)
+
+        if terms:
+            sql += ' where ' + ' and '.join(terms)
+
+        if order is not None:
+            if isinstance(order, basestring):
+                order = [order]
+            sql += ' order by ' + ', '.join(
+                name[1:] + ' desc' if name.startswith('-') else name
+                for name in order)
+
+        if limit is not None:
+            sql += ' limit %d' % limit
+
+        return sql, tuple(values)
 
-            sql += ' where ' + ' and '.join(
-                '%s = ?' % name for name in names)
+    ##
+    # Generate the rows grouped by the values of an attribute.
+    #
+    # Groups are generated in order of the attribute, as pairs of the
+    # value and the list of rows.  If keys is not None, only rows with
+    # these values are selected.  The rows are selected as by select,
+    # so that subclasses restricting selectSQL also restrict groups.
+    #
+    def groups(self, key, attributes, keys=None):
+        self.flush()
 
-            result = self.cursor.execute(sql, tuple(values))
+        if keys is None:
+            chunks = [None]
         else:
-            result = self.cursor.execute(sql)
+            keys = sorted(set(keys))
+            chunks = [keys[i:i+500] for i in xrange(0, len(keys), 500)]
+
+        for chunk in chunks:
+            where = {}
+            if chunk is not None:
+                where[key] = In(chunk)
+            sql, values = self.selectSQL(attributes, where, [key, 'rowid'])
+
+            rows = (dict(zip(attributes, row))
+                    for row in self.cursor.execute(sql, values))
+
+            for value, group in groupby(rows, lambda row: row[key]):
+                yield value, list(group)
+
+    def queryPlan(self, *attributes, **where):
+        if not attributes:
+            attributes = self.attributes
+
+        order = where.pop('order', None)
+        limit = where.pop('limit', None)
+        sql, values = self.selectSQL(attributes, where, order, limit)
 
-        for row in result:
-            yield dict(zip(attributes, row))
+        return sql, [row[-1] for row in self.cursor.execute(
+                'explain query plan ' + sql, values)]
 
     def commit(self):
+        self.flush()
         self.connection.commit()
 
     def close(self):
+        self.flush()
         self.cursor.close()
 
+##
+# Persistent cache of scores.
+#
+# Scores and their alignments are keyed by gismu, transcription and
+# scoring algorithm version.  Each time the cache is opened starts a
+# new generation, and every score used is stamped with it.  On close,
+# the scores of the oldest generations are evicted so that at most
+# size scores remain.
+#
+class ScoreCache(Table):
+    def __init__(self, connection, size=100000):
+        super(ScoreCache, self).__init__(
+            connection,
+            'Scores',
+            ['gismu', 'transcription', 'version', 'score', 'alignment',
+             'generation'])
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+    def open(self):
+        super(ScoreCache, self).open()
+        self.create()
+        self.cursor.execute('select max(generation) from Scores')
+        self.generation = (self.cursor.fetchone()[0] or 0) + 1
+
+    def create(self):
+        self.cursor.execute(
+            'create table if not exists Scores ('
+            'gismu text, transcription text, version integer, '
+            'score integer, alignment text, generation integer, '
+            'primary key (gismu, transcription, version))')
+
+        # caches written before alignments were stored
+        self.cursor.execute('pragma table_info(Scores)')
+        if 'alignment' not in [row[1] for row in self.cursor.fetchall()]:
+            self.cursor.execute(
+                'alter table Scores add column alignment text')
+
+    def lookup(self, gismu, transcription):
+        key = (gismu, transcription, SCORE_VERSION)
+        self.cursor.execute(
+            'select score, alignment from Scores '
+            'where gismu = ? and transcription = ? and version = ?', key)
+        row = self.cursor.fetchone()
+
+        if row is None or row[1] is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.cursor.execute(
+            'update Scores set generation = ? '
+            'where gismu = ? and transcription = ? and version = ?',
+            (self.generation,) + key)
+        return row
+
+    def store(self, gismu, transcription, result, alignment):
+        self.cursor.execute(
+            'insert or replace into Scores '
+            '(gismu, transcription, version, score, alignment, generation) '
+            'values (?, ?, ?, ?, ?, ?)',
+            (gismu, transcription, SCORE_VERSION, result, alignment,
+             self.generation))
+
+    def explain(self, gismu, transcription):
+        row = self.lookup(gismu, transcription)
+        if row is None:
+            row = scoreTranscription(gismu, transcription)
+            self.store(gismu, transcription, *row)
+        return row
+
+    def evict(self):
+        self.cursor.execute(
+            'delete from Scores where rowid not in ('
+            'select rowid from Scores '
+            'order by generation desc limit ?)', (self.size,))
+
+    def close(self):
+        self.evict()
+        self.commit()
+        super(ScoreCache, self).close()
+
 ##
 # Table of lojban sourcewords.
 #
+# The source words of all languages are stored in a single table, with
+# the id of their language.  The tables of the individual languages
+# select from it, and give the fields in the file of their language.
+#
+# Rows are scored on insert, unless they already carry a score.  The
+# letters matched are stored alongside the score.
+#
 class SourcewordTable(Table):
-    def insert(self, fields):
-        if 'transcription' in fields:
-            fields['score'] = score(fields['gismu'], fields['transcription'])
-        super(SourcewordTable, self).insert(fields)
+    cache = None
+    language = None
+    fields = None
+
+    def __init__(self, connection):
+        super(SourcewordTable, self).__init__(
+            connection,
+            'Sourcewords',
+            ['gismu', 'language', 'keyword', 'transcription', 'sourceword',
+             'alternative', 'transliteration', 'translation', 'class',
+             'comment', 'score', 'alignment'],
+            ['gismu', ('language', 'score')],
+            dict(language='integer', score='integer'))
+
+    def create(self):
+        super(SourcewordTable, self).create()
+
+        table = LanguageTable(self.connection)
+        table.open()
+        table.create()
+        table.close()
+
+    def rows(self, fields):
+        if 'transcription' in fields and 'score' not in fields:
+            if self.cache is not None:
+                explanation = self.cache.explain(fields['gismu'],
+                                                 fields['transcription'])
+            else:
+                explanation = scoreTranscription(fields['gismu'],
+                                                 fields['transcription'])
+            fields['score'], fields['alignment'] = explanation
+        if self.language is not None:
+            fields['language'] = self.language
+        return [fields]
+
+    def selectSQL(self, attributes, where, order=None, limit=None):
+        if self.language is not None:
+            where = dict(where, language=self.language)
+        return super(SourcewordTable, self).selectSQL(attributes, where,
+                                                      order, limit)
+
+##
+# Table of the languages of the source words.
+#
+class LanguageTable(Table):
+    def __init__(self, connection):
+        super(LanguageTable, self).__init__(
+            connection,
+            'Languages',
+            ['id', 'langcode', 'language'],
+            types=dict(id='integer'),
+            key=['id'])
+
+    def create(self):
+        super(LanguageTable, self).create()
+        self.cursor.executemany(
+            'insert or ignore into Languages (id, langcode, language) '
+            'values (?, ?, ?)', languages)
 
 ##
 # Table of gismu definitions.
@@ -81,7 +522,8 @@ class DefinitionTable(Table):
         super(DefinitionTable, self).__init__(
             connection,
             'Definitions',
-            ['gismu', 'definition', 'comments', 'xrefs'])
+            ['gismu', 'definition', 'comments', 'xrefs'],
+            key=['gismu'])
 
 ##
 # Table with gismu hintwords.
@@ -91,7 +533,8 @@ class HintwordTable(Table):
         super(HintwordTable, self).__init__(
             connection,
             'Hintwords',
-            ['gismu', 'hintword'])
+            ['gismu', 'hintword'],
+            key=['gismu'])
 
 ##
 # Table associating gismu with textbook chapters.
@@ -101,7 +544,8 @@ class TextbookTable(Table):
         super(TextbookTable, self).__init__(
             connection,
             'Textbook',
-            ['gismu', 'textbook'])
+            ['gismu', 'textbook'],
+            key=['gismu'])
 
 ##
 # Table with gismu frequencies.
@@ -111,7 +555,9 @@ class FrequencyTable(Table):
         super(FrequencyTable, self).__init__(
             connection,
             'Frequency',
-            ['gismu', 'frequency'])
+            ['gismu', 'frequency'],
+            types=dict(frequency='integer'),
+            key=['gismu'])
 
 ##
 # Table with rafsi.
@@ -121,15 +567,13 @@ class RafsiTable(Table):
         super(RafsiTable, self).__init__(
             connection,
             'Rafsi',
-            ['gismu', 'rafsi'])
+            ['gismu', 'rafsi'],
+            key=['rafsi'])
 
-    def insert(self, fields):
-        for name in ['cvc', 'ccv', 'cvv']:
-            rafsi = fields.get(name)
-            if rafsi:
-                super(RafsiTable, self).insert(
-                    dict(gismu=fields['gismu'],
-                         rafsi=rafsi))
+    def rows(self, fields):
+        return [dict(gismu=fields['gismu'], rafsi=fields[name])
+                for name in ['cvc', 'ccv', 'cvv']
+                if fields.get(name)]
 
 ##
 # Table with gismu keywords.
@@ -139,80 +583,165 @@ class KeywordTable(Table):
         super(KeywordTable, self).__init__(
             connection,
             'Keywords',
-            ['gismu', 'place', 'keyword'])
+            ['gismu', 'place', 'keyword'],
+            ['gismu', 'keyword'],
+            dict(place='integer'))
 
-    def insert(self, fields):
-        super(KeywordTable, self).insert(
-            dict(gismu=fields['gismu'],
-                 place=1,
-                 keyword=fields['keyword']))
+    def rows(self, fields):
+        return [dict(gismu=fields['gismu'],
+                     place=1,
+                     keyword=fields['keyword'])]
 
 ##
 # Table with Arabic etymology.
 #
 class ArabicTable(SourcewordTable):
-    def __init__(self, connection):
-        super(ArabicTable, self).__init__(
-            connection,
-            'Arabic',
-            ['gismu', 'keyword', 'transcription', 'sourceword',
-             'transliteration', 'translation', 'comment', 'score'])
+    language = 3
+    fields = ['gismu', 'keyword', 'transcription', 'sourceword',
+              'transliteration', 'translation', 'comment']
 
 ##
 # Table with Chinese etymology.
 #
 class ChineseTable(SourcewordTable):
-    def __init__(self, connection):
-        super(ChineseTable, self).__init__(
-            connection,
-            'Chinese',
-            ['gismu', 'keyword', 'transcription', 'sourceword',
-             'alternative', 'transliteration', 'translation', 'comment',
-             'score'])
+    language = 1
+    fields = ['gismu', 'keyword', 'transcription', 'sourceword',
+              'alternative', 'transliteration', 'translation', 'comment']
 
 ##
 # Table with English etymology.
 #
 class EnglishTable(SourcewordTable):
-    def __init__(self, connection):
-        super(EnglishTable, self).__init__(
-            connection,
-            'English',
-            ['gismu', 'keyword', 'transcription', 'sourceword',
-             'comment', 'score'])
+    language = 6
+    fields = ['gismu', 'keyword', 'transcription', 'sourceword', 'comment']
 
 ##
 # Table with Hindi etymology.
 #
 class HindiTable(SourcewordTable):
-    def __init__(self, connection):
-        super(HindiTable, self).__init__(
-            connection,
-            'Hindi',
-            ['gismu', 'keyword', 'transcription', 'sourceword',
-             'transliteration', 'translation', 'class', 'comment', 'score'])
+    language = 2
+    fields = ['gismu', 'keyword', 'transcription', 'sourceword',
+              'transliteration', 'translation', 'class', 'comment']
 
 ##
 # Table with Russian etymology.
 #
 class RussianTable(SourcewordTable):
-    def __init__(self, connection):
-        super(RussianTable, self).__init__(
-            connection,
-            'Russian',
-            ['gismu', 'keyword', 'transcription', 'sourceword',
-             'transliteration', 'translation', 'comment', 'score'])
+    language = 4
+    fields = ['gismu', 'keyword', 'transcription', 'sourceword',
+              'transliteration', 'translation', 'comment']
 
 ##
 # Table with Spanish etymology.
 #
 class SpanishTable(SourcewordTable):
+    language = 5
+    fields = ['gismu', 'keyword', 'transcription', 'sourceword',
+              'translation', 'comment']
+
+##
+# Table recording the version and content hash of each loaded file.
+#
+class FileTable(Table):
+    def __init__(self, connection):
+        super(FileTable, self).__init__(
+            connection,
+            'Files',
+            ['filename', 'hash', 'version'],
+            key=['filename'])
+
+##
+# Full text search index over the gismu.
+#
+# The index holds the definitions and comments of the gismu, their
+# keywords, and the translations of their source words, each tagged
+# with the field it comes from.  English source words are their own
+# translations.  The index is filled from the other tables, either
+# entirely or for a list of gismu whose rows changed.
+#
+# Searches rank gismu by the sum of the bm25 scores of their matching
+# texts, so that gismu matching in more fields rank higher.
+#
+class SearchTable(Table):
     def __init__(self, connection):
-        super(SpanishTable, self).__init__(
+        super(SearchTable, self).__init__(
             connection,
-            'Spanish',
-            ['gismu', 'keyword', 'transcription', 'sourceword',
-             'translation', 'comment', 'score'])
+            'Search',
+            ['gismu', 'field', 'text'],
+            [])
+
+    def create(self):
+        self.cursor.execute(
+            'create virtual table if not exists Search using fts5 ('
+            'gismu unindexed, field unindexed, text)')
+
+    ##
+    # Fill the index for the gismu in a list, or for all gismu if the
+    # list is None.
+    #
+    def build(self, gismus=None):
+        self.flush()
+
+        english = [id for id, langcode, language in languages
+                   if langcode == 'en'][0]
+        sources = [
+            ("'definition', definition", 'Definitions'),
+            ("'comments', comments", 'Definitions'),
+            ("'keyword', keyword", 'Keywords'),
+            ("'translation', case language when %d then sourceword "
+             "else translation end" % english, 'Sourcewords')]
+
+        if gismus is None:
+            chunks = [None]
+            self.cursor.execute('delete from Search')
+        else:
+            gismus = sorted(set(gismus))
+            chunks = [gismus[i:i+500] for i in xrange(0, len(gismus), 500)]
+
+        for chunk in chunks:
+            condition = ''
+            if chunk is not None:
+                marks = ', '.join(['?'] * len(chunk))
+                condition = ' and gismu in (%s)' % marks
+                self.cursor.execute(
+                    'delete from Search where gismu in (%s)' % marks, chunk)
+
+            for columns, tablename in sources:
+                self.cursor.execute(
+                    'insert into Search (gismu, field, text) '
+                    'select * from (select gismu, %s as text from %s) '
+                    "where text is not null and text != ''%s" % (
+                        columns, tablename, condition),
+                    tuple(chunk or ()))
+
+    ##
+    # Return the gismu best matching a query, with their scores and
+    # the fields matched.
+    #
+    # Each word of the query must occur in a text.  A word ending in
+    # an asterisk matches as a prefix.
+    #
+    def search(self, query, limit=10):
+        terms = []
+        for word in query.split():
+            prefix = word.endswith('*')
+            word = word.rstrip('*')
+            if word:
+                terms.append('"%s"%s' % (word.replace('"', '""'),
+                                         '*' if prefix else ''))
+
+        if not terms:
+            return []
+
+        self.cursor.execute(
+            'select gismu, -sum(rank) as score, group_concat(distinct field) '
+            'from (select gismu, field, rank from Search '
+            'where Search match ?) '
+            'group by gismu order by score desc, gismu limit ?',
+            (' '.join(terms), limit))
+
+        return [(gismu, score, fields.split(','))
+                for gismu, score, fields in self.cursor.fetchall()]
 
 ##
 # Table of cmavo definitions.
@@ -222,5 +751,6 @@ class CmavoTable(Table):
         super(CmavoTable, self).__init__(
             connection,
             'Cmavo',
-            ['cmavo', 'selmao', 'keyword', 'definition', 'comment'])
+            ['cmavo', 'selmao', 'keyword', 'definition', 'comment'],
+            key=['cmavo'])
 
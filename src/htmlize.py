@@ -2,6 +2,7 @@
 
 from version import VERSION
 from gismu import GismuFactory
+from gismusnapshot import Snapshot
 from format import Formatter
 from util import *
 
@@ -12,6 +13,7 @@ import re
 from datetime import datetime
 from collections import defaultdict
 from itertools import izip, count, dropwhile
+from optparse import OptionParser
 
 ##
 # Quote ampersand and angular brackets.
@@ -187,6 +189,9 @@ class SourcewordFormatter(Formatter):
   <span class="comment">(?)</span>
 </span>'''
 
+    # Mark the letters of the transcription matching the gismu.
+    highlight = False
+
     def __init__(self, sourceword, sourcewordnumber):
         super(SourcewordFormatter, self).__init__()
 
@@ -194,6 +199,9 @@ class SourcewordFormatter(Formatter):
         self.sourceword = q(sourceword.sourceword)
         self.alternative = q(sourceword.alternative)
         self.transcription = q(sourceword.transcription)
+        self.highlighted = self.highlight and bool(sourceword.alignment)
+        if self.highlighted:
+            self.transcription = self.markupAlignment(sourceword)
         self.transliteration = q(sourceword.transliteration)
         self.translation = q(sourceword.translation)
         self.langcode = sourceword.langcode
@@ -207,7 +215,7 @@ class SourcewordFormatter(Formatter):
         if not self.sourceword:
             lines = removelike(lines, '"sourceword"')
             lines = removelike(lines, '"comment"')
-        else:
+        elif not self.highlighted:
             lines = removelike(lines, '"sourceword transcription"')
 
         if not self.alternative:
@@ -225,6 +233,12 @@ class SourcewordFormatter(Formatter):
 
         self.format = '\n'.join(lines)
 
+    def markupAlignment(self, sourceword):
+        matched = set(j for i, j in sourceword.alignment)
+        return ''.join('<span class="match">%s</span>' % q(c)
+                       if j in matched else q(c)
+                       for j, c in enumerate(sourceword.transcription))
+
 ##
 # Print a gismu etymology.
 #
@@ -485,13 +499,17 @@ class DocumentFormatter(Formatter):
 ##
 # Generate HTML.
 #
-def main(infilename, outfilename):
+# If a snapshot is given, the gismu are read from it, and the snapshot
+# is taken anew whenever the database has changed.
+#
+def main(infilename, outfilename, snapshotfilename=None):
     sys.stderr.write('Loading data...')
 
-    connection = sqlite3.connect(infilename)
-    factory = GismuFactory(connection)
-    gismudict = dict((gismu, factory.create(gismu))
-                     for gismu in factory.gismu())
+    if snapshotfilename is not None:
+        factory = Snapshot.load(snapshotfilename, infilename)
+    else:
+        factory = GismuFactory(sqlite3.connect(infilename))
+    gismudict = factory.createAll()
     rafsidict = dict((rafsi, gismu)
                      for gismu, entry in gismudict.iteritems()
                      for rafsi in entry.rafsi)
@@ -525,11 +543,22 @@ def main(infilename, outfilename):
 # Main entry point.
 #
 if __name__ == '__main__':
-    if len(sys.argv) >= 3:
-        infilename, outfilename = sys.argv[1], sys.argv[2]
-    elif len(sys.argv) == 2:
-        infilename, outfilename = sys.argv[1], '%s.html'
+    parser = OptionParser(usage='%prog [options] [database [output]]')
+    parser.add_option('--highlight', action='store_true',
+                      help='mark the letters of each source word '
+                      'matching the gismu')
+    parser.add_option('-s', '--snapshot', metavar='FILE',
+                      help='read the gismu from the snapshot FILE, '
+                      'taking it if needed')
+    options, args = parser.parse_args()
+
+    SourcewordFormatter.highlight = options.highlight
+
+    if len(args) >= 2:
+        infilename, outfilename = args[0], args[1]
+    elif len(args) == 1:
+        infilename, outfilename = args[0], '%s.html'
     else:
         infilename, outfilename = 'dictionary.sql', '%s.html'
 
-    main(infilename, outfilename)
+    main(infilename, outfilename, options.snapshot)
@@ -5,46 +5,260 @@ from gismuloaders import *
 import sys
 import os.path
 import sqlite3
+import multiprocessing
+from timeit import default_timer
+from optparse import OptionParser
+
+##
+# Loaders and the files they load.
+#
+loaders = [
+    (CmavoLoader, 'cmavo.txt'),
+    (GismuLoader, 'gismu.txt'),
+    (ObliqueKeywordsLoader, 'oblique_keywords.txt'),
+    (ArabicLoader, 'lojban-source-words_ar.txt'),
+    (ChineseLoader, 'lojban-source-words_zh.txt'),
+    (EnglishLoader, 'lojban-source-words_en.txt'),
+    (HindiLoader, 'lojban-source-words_hi.txt'),
+    (RussianLoader, 'lojban-source-words_ru.txt'),
+    (SpanishLoader, 'lojban-source-words_es.txt')]
 
 ##
 # Load from all files into all tables.
 #
-def main(directory, filename):
-    connection = sqlite3.connect(filename)
-    loaders = [
-        (CmavoLoader, 'cmavo.txt'),
-        (GismuLoader, 'gismu.txt'),
-        (ObliqueKeywordsLoader, 'oblique_keywords.txt'),
-        (ArabicLoader, 'lojban-source-words_ar.txt'),
-        (ChineseLoader, 'lojban-source-words_zh.txt'),
-        (EnglishLoader, 'lojban-source-words_en.txt'),
-        (HindiLoader, 'lojban-source-words_hi.txt'),
-        (RussianLoader, 'lojban-source-words_ru.txt'),
-        (SpanishLoader, 'lojban-source-words_es.txt')]
-
-    for loaderclass, filename in loaders:
-        print 'Loading %s ...' % filename
+# The version and hash of every file are recorded, so that the database
+# can later be updated incrementally.  The search index is built last,
+# from the loaded tables.
+#
+# Unless in fast mode, the database must not have been loaded before.
+#
+# In fast mode, the database is built from scratch in a temporary file
+# within a single transaction, with journaling and synchronous writes
+# relaxed.  Indexes are created at the end, and the temporary file is
+# then renamed over the database.
+#
+# In pipeline mode, every file is parsed and scored concurrently in a
+# process of its own, and the rows are inserted by this process in the
+# usual order.  The score cache is then only updated, not consulted.
+#
+def main(directory, filename, cachefilename, jobs=1, batchsize=None,
+         fast=False, pipeline=False):
+    if fast:
+        tempfilename = filename + '.tmp'
+        if os.path.exists(tempfilename):
+            os.remove(tempfilename)
+        connection = sqlite3.connect(tempfilename, isolation_level=None)
+        connection.execute('pragma journal_mode = memory')
+        connection.execute('pragma synchronous = off')
+        connection.execute('pragma cache_size = -65536')
+        connection.execute('begin')
+    else:
+        connection = sqlite3.connect(filename)
+        if schemaVersion(connection) == SCHEMA_VERSION:
+            sys.exit('%s: already loaded, rebuild it with -f '
+                     'or update it with -i' % filename)
+        if schemaVersion(connection) is not None:
+            sys.exit('%s: schema version %d, run migrate.py first' % (
+                    filename, schemaVersion(connection)))
+
+    connection.execute('pragma user_version = %d' % SCHEMA_VERSION)
 
+    cache = ScoreCache(sqlite3.connect(cachefilename))
+    cache.open()
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+    files = FileTable(connection)
+    files.open()
+    files.create()
+
+    start = default_timer()
+    loaded = []
+
+    for loaderclass, datafilename in loaders:
         loader = loaderclass(connection,
-                             os.path.join(directory, filename))
+                             os.path.join(directory, datafilename))
+
+        loader.setScoreCache(cache)
+        if batchsize is not None:
+            loader.setBatchSize(batchsize)
+        if pool is not None:
+            loader.setPool(pool)
+        if fast:
+            loader.setFastLoad()
+        if pipeline:
+            loader.startProducer()
+
+        loaded.append(loader)
+
+    try:
+        for loader, (loaderclass, datafilename) in zip(loaded, loaders):
+            sys.stdout.write('Loading %s ...' % datafilename)
+            sys.stdout.flush()
+            begin = default_timer()
+
+            loader.open()
+            loader.load()
+            loader.close()
+
+            loader.record(files)
+            if not fast:
+                connection.commit()
+
+            print ' %.2f s' % (default_timer() - begin)
+    finally:
+        for loader in loaded:
+            loader.stopProducer()
+
+    sys.stdout.write('Building search index ...')
+    sys.stdout.flush()
+    begin = default_timer()
+
+    search = SearchTable(connection)
+    search.open()
+    search.create()
+    search.build()
+    search.close()
+
+    print ' %.2f s' % (default_timer() - begin)
+
+    if fast:
+        sys.stdout.write('Creating indexes ...')
+        sys.stdout.flush()
+        begin = default_timer()
+
+        for loader in loaded:
+            loader.createIndexes()
+
+        files.close()
+        connection.execute('commit')
+        connection.close()
+        os.rename(tempfilename, filename)
+
+        print ' %.2f s' % (default_timer() - begin)
+
+    else:
+        files.close()
+        connection.commit()
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    cache.close()
+
+    print 'Total: %.2f s' % (default_timer() - start)
+    print 'Score cache: %d hits, %d misses' % (cache.hits, cache.misses)
+
+##
+# Update the database with the changes to the files since they were
+# last loaded.
+#
+# Files with an unchanged hash are skipped.  The search index is
+# rebuilt for the gismu whose rows changed.  Return false without
+# changes if the database was not recorded by the current loaders, in
+# which case it needs to be rebuilt.
+#
+def update(directory, filename, cachefilename):
+    if not os.path.exists(filename):
+        return False
+
+    connection = sqlite3.connect(filename)
+    if schemaVersion(connection) != SCHEMA_VERSION:
+        connection.close()
+        return False
+
+    files = FileTable(connection)
+    files.open()
+    files.create()
+
+    updates = [loaderclass(connection, os.path.join(directory, datafilename))
+               for loaderclass, datafilename in loaders]
+
+    if not all(loader.isRecorded(files) for loader in updates):
+        files.close()
+        connection.close()
+        return False
 
-        loader.open()
-        loader.load()
-        loader.close()
+    cache = ScoreCache(sqlite3.connect(cachefilename))
+    cache.open()
+    for loader in updates:
+        loader.setScoreCache(cache)
+
+    start = default_timer()
+
+    for loader in updates:
+        sys.stdout.write('Updating %s ...' % loader.name())
+        sys.stdout.flush()
+        begin = default_timer()
+
+        if loader.update(files, updates):
+            files.commit()
+            print ' %.2f s' % (default_timer() - begin)
+        else:
+            print ' unchanged'
+
+    changed = set()
+    for loader in updates:
+        changed |= loader.changed
+    changed.discard(None)
+
+    if changed:
+        search = SearchTable(connection)
+        search.open()
+        search.create()
+        search.build(changed)
+        search.close()
+
+    # indexes added since the database was built
+    for loader in updates:
+        loader.createIndexes()
+    files.commit()
+
+    files.close()
+    cache.close()
+
+    print 'Total: %.2f s' % (default_timer() - start)
+    print 'Score cache: %d hits, %d misses' % (cache.hits, cache.misses)
+
+    return True
 
 ##
 # Main entry point.
 #
 if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] [database [scorecache]]')
+    parser.add_option('-j', '--jobs', type='int', default=1,
+                      help='score source words in JOBS processes')
+    parser.add_option('-b', '--batch-size', type='int', metavar='SIZE',
+                      help='insert rows in batches of SIZE')
+    parser.add_option('-f', '--fast', action='store_true',
+                      help='rebuild the database in a single transaction')
+    parser.add_option('-p', '--pipeline', action='store_true',
+                      help='parse all files concurrently')
+    parser.add_option('-i', '--incremental', action='store_true',
+                      help='apply only the changes to the files, '
+                      'rebuilding the database if needed')
+    options, args = parser.parse_args()
+
     directory = os.path.join(
         os.path.dirname(
             os.path.dirname(
                 os.path.realpath(sys.argv[0]))),
         'data')
 
-    if len(sys.argv) >= 2:
-        filename = sys.argv[1]
+    if len(args) >= 1:
+        filename = args[0]
     else:
         filename = 'dictionary.sql'
 
-    main(directory, filename)
+    if len(args) >= 2:
+        cachefilename = args[1]
+    else:
+        cachefilename = 'scorecache.sql'
+
+    if options.incremental:
+        if update(directory, filename, cachefilename):
+            sys.exit()
+        options.fast = True
+
+    main(directory, filename, cachefilename, options.jobs,
+         options.batch_size, options.fast, options.pipeline)
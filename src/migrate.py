@@ -0,0 +1,215 @@
+#!/usr/bin/python
+
+from gismutables import *
+
+import sys
+import os
+import os.path
+import sqlite3
+from timeit import default_timer
+from optparse import OptionParser
+
+##
+# Tables copied as they are, with their columns converted to the
+# column types of the current schema.
+#
+tables = [DefinitionTable,
+          HintwordTable,
+          TextbookTable,
+          FrequencyTable,
+          RafsiTable,
+          KeywordTable,
+          CmavoTable,
+          FileTable]
+
+##
+# Return the names of the columns of a table, or None if there is no
+# such table.
+#
+def columns(connection, database, tablename):
+    result = [row[1] for row in connection.execute(
+            'pragma %s.table_info(%s)' % (database, tablename))]
+    return result or None
+
+##
+# Return the name of a table of the current schema with a primary key
+# that has duplicates in the old database, or None.
+#
+# Databases of schema version 1 were loaded again by appending to the
+# tables, so the rows of every load are there.  Such databases cannot
+# be migrated, as the rows of the other tables cannot be told apart from
+# rows the files actually repeat, such as keywords.
+#
+def duplicates(connection, database):
+    for tableclass in tables:
+        table = tableclass(None)
+        names = columns(connection, database, table.tablename)
+        if names is None or not table.key or set(table.key) - set(names):
+            continue
+
+        for row in connection.execute(
+            'select 1 from %s.%s group by %s having count(*) > 1 '
+            'limit 1' % (database, table.tablename, ', '.join(table.key))):
+            return table.tablename
+
+    return None
+
+##
+# Migrate a database of schema version 1 to the current schema.
+#
+# The old database is attached to the new one and every table copied
+# over in a single statement, which lets SQLite apply the column types.
+# The tables of the individual languages are merged into the single
+# source word table.  Files are still recorded with their old loader
+# versions, so that the next incremental load rebuilds the database.
+#
+# Databases loaded more than once are refused before anything is
+# written.
+#
+# If the target is the source, the old database is kept as a backup.
+# Return the filename of the old database.
+#
+def migrate(source, target):
+    connection = sqlite3.connect(source)
+    version = schemaVersion(connection)
+    duplicate = duplicates(connection, 'main')
+    connection.close()
+
+    if version != 1:
+        raise ValueError('%s: cannot migrate schema version %s' % (
+                source, version))
+
+    if duplicate is not None:
+        raise ValueError('%s: %s has duplicate rows, as the database was '
+                         'loaded more than once; rebuild it with load.py -f'
+                         % (source, duplicate))
+
+    tempfilename = target + '.tmp'
+    if os.path.exists(tempfilename):
+        os.remove(tempfilename)
+
+    connection = sqlite3.connect(tempfilename, isolation_level=None)
+    connection.execute('attach database ? as old', (source,))
+    connection.execute('begin')
+
+    created = [tableclass(connection) for tableclass in tables]
+    created.append(SourcewordTable(connection))
+
+    for table in created:
+        table.open()
+        table.create()
+
+    for table in created[:-1]:
+        names = columns(connection, 'old', table.tablename)
+        if names is None:
+            continue
+
+        names = [name for name in table.attributes if name in names]
+        connection.execute(
+            'insert into main.%s (%s) select %s from old.%s' % (
+                table.tablename,
+                ', '.join(names),
+                ', '.join(names),
+                table.tablename))
+
+    for id, langcode, language in languages:
+        names = columns(connection, 'old', language)
+        if names is None:
+            continue
+
+        names = [name for name in created[-1].attributes if name in names]
+        connection.execute(
+            'insert into main.Sourcewords (language, %s) '
+            'select ?, %s from old.%s order by rowid' % (
+                ', '.join(names),
+                ', '.join(names),
+                language), (id,))
+
+    for table in created:
+        table.createIndexes()
+        table.close()
+
+    connection.execute('pragma user_version = %d' % SCHEMA_VERSION)
+    connection.execute('commit')
+    connection.execute('detach database old')
+    connection.close()
+
+    if target == source:
+        source = source + '.bak'
+        os.rename(target, source)
+
+    os.rename(tempfilename, target)
+    return source
+
+##
+# Return the tables read to build all gismu.
+#
+def fullBuildTables(connection):
+    if schemaVersion(connection) == 1:
+        return ['Definitions', 'Rafsi', 'Keywords'] + [
+            language for id, langcode, language in languages]
+    return ['Definitions', 'Rafsi', 'Keywords', 'Sourcewords']
+
+##
+# Return the best time of reading all rows needed to build all gismu.
+#
+# Each table is read grouped by gismu, as the gismu factory does.
+#
+def measureFullBuild(filename, repeat=5):
+    connection = sqlite3.connect(filename)
+    tablenames = fullBuildTables(connection)
+
+    best = None
+    for i in xrange(repeat):
+        start = default_timer()
+        for tablename in tablenames:
+            connection.execute(
+                'select * from %s order by gismu, rowid' % tablename
+                ).fetchall()
+        elapsed = default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    connection.close()
+    return best
+
+##
+# Print the size and full build time of the database before and after
+# migrating.
+#
+def report(source, target):
+    rows = [('size', '%d kB' % (os.path.getsize(source) // 1024),
+             '%d kB' % (os.path.getsize(target) // 1024)),
+            ('full build', '%.1f ms' % (measureFullBuild(source) * 1e3),
+             '%.1f ms' % (measureFullBuild(target) * 1e3))]
+
+    print '%-10s  %10s  %10s' % ('', 'before', 'after')
+    for row in rows:
+        print '%-10s  %10s  %10s' % row
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] database [output]')
+    parser.add_option('-m', '--measure', action='store_true',
+                      help='print the size and full build time '
+                      'before and after')
+    options, args = parser.parse_args()
+
+    if not args:
+        parser.error('no database given')
+
+    source = args[0]
+    if len(args) >= 2:
+        target = args[1]
+    else:
+        target = source
+
+    try:
+        source = migrate(source, target)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    if options.measure:
+        report(source, target)
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+
+from gismuscore import score
+
+import sys
+import codecs
+import fileinput
+import multiprocessing
+from collections import deque
+from itertools import islice
+from timeit import default_timer
+from optparse import OptionParser
+
+##
+# Generate (gismu, transcription) pairs from TAB separated lines.
+#
+# The lines are read from a fileinput object.  Lines which are not
+# valid UTF-8, or have no TAB, are reported on standard error with
+# their file name and line number, and skipped.
+#
+def readPairs(lines):
+    for line in lines:
+        try:
+            line = line.decode('utf-8').rstrip('\r\n')
+        except UnicodeDecodeError:
+            skip(lines, 'not valid UTF-8')
+            continue
+        if not line:
+            continue
+        if '\t' not in line:
+            skip(lines, 'no TAB')
+            continue
+        gismu, transcription = line.split('\t', 1)
+        yield gismu.strip(), transcription.strip()
+
+##
+# Report a skipped line.
+#
+def skip(lines, reason):
+    sys.stderr.write('%s:%d: %s, line skipped\n' % (
+            lines.filename(), lines.filelineno(), reason))
+
+##
+# Score a list of pairs.
+#
+# This runs in the worker processes when scoring in parallel.
+#
+def scoreChunk(pairs):
+    return [(gismu, transcription, score(gismu, transcription))
+            for gismu, transcription in pairs]
+
+##
+# Generate lists of up to size items.
+#
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            break
+        yield chunk
+
+##
+# Generate scored pairs in input order.
+#
+# With a process pool, chunks are scored in the pool.  At most two
+# chunks per worker are pending at any time, so memory stays bounded
+# however long the input is.
+#
+def scorePairs(pairs, pool=None, jobs=1, chunksize=1024):
+    if pool is None:
+        for gismu, transcription in pairs:
+            yield gismu, transcription, score(gismu, transcription)
+        return
+
+    pending = deque()
+    for chunk in chunks(pairs, chunksize):
+        pending.append(pool.apply_async(scoreChunk, (chunk,)))
+        if len(pending) >= 2 * jobs:
+            for row in pending.popleft().get():
+                yield row
+
+    while pending:
+        for row in pending.popleft().get():
+            yield row
+
+##
+# Score pairs from files or standard input and write them out.
+#
+def main(filenames, jobs):
+    output = codecs.getwriter('utf-8')(sys.stdout)
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+
+    rows = 0
+    start = default_timer()
+
+    for gismu, transcription, s in scorePairs(
+            readPairs(fileinput.input(filenames)), pool, jobs):
+        output.write(u'%s\t%s\t%d\n' % (gismu, transcription, s))
+        rows += 1
+
+    elapsed = default_timer() - start
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    sys.stderr.write('%d rows in %.2f s (%.0f rows/s)\n' % (
+            rows, elapsed, rows / elapsed if elapsed else 0))
+
+##
+# Main entry point.
+#
+if __name__ == '__main__':
+    parser = OptionParser(usage='%prog [options] [file...]')
+    parser.add_option('-j', '--jobs', type='int', default=1,
+                      help='score in JOBS processes')
+    options, args = parser.parse_args()
+
+    main(args, options.jobs)